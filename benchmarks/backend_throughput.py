@@ -0,0 +1,36 @@
+# Measure Trimmer.trim_blank throughput of each backend on CJK text.
+import random
+import sys
+import timeit
+from table_trimmer import TRIMMER_BACKENDS
+
+WORDS = [
+    '日本語', 'の', '文章', 'です', '。', '漢字', 'と', 'かな', 'を', '含む',
+    '中文', '文本', 'Sphinx', 'API', '(注)', '、', '\n', ' ', ' ']
+
+def make_text(size, seed=0):
+    rand = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rand.choice(WORDS)
+        words.append(word)
+        length += len(word)
+    return ''.join(words)
+
+def main(argv):
+    size = int(argv[0]) if argv else 1000000
+    text = make_text(size)
+    num_bytes = len(text.encode('utf-8'))
+    print('%10s %12s %10s' % ('backend', 'time [ms]', 'MB/s'))
+    for name, backend in sorted(TRIMMER_BACKENDS.items()):
+        for keep_alnum_blank in (False, True):
+            trimmer = backend(keep_alnum_blank, r'[\s(]', r'[\s),.:?]')
+            elapsed = min(timeit.repeat(
+                lambda: trimmer.trim_blank(text), number=1, repeat=3))
+            print('%10s %12.1f %10.2f' % (
+                '%s%s' % (name, '+alnum' if keep_alnum_blank else ''),
+                elapsed * 1e3, num_bytes / elapsed / 1e6))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
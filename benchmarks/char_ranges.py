@@ -0,0 +1,41 @@
+# Compare classifying characters with the interval table of CharRanges to
+# the regular expression classes built from the same ranges.
+import re
+import sys
+import timeit
+from backend_throughput import make_text
+from sphinxcontrib.trimblank import CJK_RANGES, CharRanges
+
+def bench(label, func, num_ops):
+    elapsed = min(timeit.repeat(func, number=1, repeat=5))
+    print('%-28s %10.1f %12.1f' % (label, elapsed * 1e3, elapsed / num_ops * 1e9))
+
+def main(argv):
+    size = int(argv[0]) if argv else 200000
+    chars = list(make_text(size))
+    # Short texts as given to trim_head and trim_tail.
+    texts = [''.join(chars[idx:idx + 3]) for idx in range(0, len(chars), 3)]
+    regex_char = re.compile(CJK_RANGES.regex_class).match
+    regex_head = re.compile(r'%s$' % CJK_RANGES.regex_class).search
+    regex_tail = re.compile(r'%s\s$' % CJK_RANGES.regex_class).search
+    print('%-28s %10s %12s' % ('classification', 'time [ms]', 'ns/op'))
+    bench('regex class', lambda: [regex_char(char) for char in chars],
+          len(chars))
+    def classify_uncached():
+        char_ranges = CharRanges(CJK_RANGES.intervals)
+        return [char_ranges[char] for char in chars]
+    bench('interval table (cold)', classify_uncached, len(chars))
+    bench('interval table', lambda: [CJK_RANGES[char] for char in chars],
+          len(chars))
+    bench('regex <CJK>$', lambda: [regex_head(txt) for txt in texts],
+          len(texts))
+    bench('ends_with', lambda: [CJK_RANGES.ends_with(txt) for txt in texts],
+          len(texts))
+    bench(r'regex <CJK>\s$', lambda: [regex_tail(txt) for txt in texts],
+          len(texts))
+    bench('ends_with(blank=True)',
+          lambda: [CJK_RANGES.ends_with(txt, blank=True) for txt in texts],
+          len(texts))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+# Synthetic doctrees for the benchmarks.
+import random
+from unittest.mock import Mock
+from docutils import nodes
+from sphinxcontrib.trimblank import findall
+
+SCRIPTS = {
+    'japanese': [
+        '日本語', 'の', '文章', 'です', '。', '漢字', 'と', 'ひらがな', 'を',
+        '含む', '、', 'カタカナ', 'も', 'あります', '（注）'],
+    'chinese': [
+        '中文', '的', '文本', '。', '汉字', '和', '标点', '，', '这是', '一个',
+        '例子', '（注）', '文档'],
+    'mixed': [
+        '日本語', 'の', 'Sphinx', 'API', 'です', '。', 'function', '中文',
+        'and', 'text', 'を', '、', '(see', 'below)', 'です'],
+}
+BLANKS = [' ', ' ', '\n']
+
+def make_text(rand, script, num_words):
+    words = SCRIPTS[script]
+    result = []
+    for _ in range(num_words):
+        result.append(rand.choice(words))
+        if rand.random() < 0.3:
+            result.append(rand.choice(BLANKS))
+    return ''.join(result)
+
+def make_inline(rand, script, depth):
+    elem = rand.choice((nodes.emphasis, nodes.strong))()
+    if depth > 1:
+        elem += nodes.Text(make_text(rand, script, 2))
+        elem += make_inline(rand, script, depth - 1)
+    elem += nodes.Text(make_text(rand, script, 2))
+    return elem
+
+def make_paragraph(rand, script, num_inlines, depth=1, words=6):
+    paragraph = nodes.paragraph()
+    paragraph += nodes.Text(make_text(rand, script, words))
+    for _ in range(num_inlines):
+        if depth > 1 or rand.random() < 0.5:
+            paragraph += make_inline(rand, script, depth)
+        else:
+            paragraph += nodes.reference(text=make_text(rand, script, 1))
+        paragraph += nodes.Text(make_text(rand, script, words))
+    return paragraph
+
+def make_document(children):
+    doctree = nodes.document(Mock(), Mock())
+    section = nodes.section()
+    section += nodes.title(text='タイトル')
+    section.extend(children)
+    doctree += section
+    return doctree
+
+def small_paragraphs(script, scale, seed=0):
+    rand = random.Random(seed)
+    return make_document([
+        make_paragraph(rand, script, 2) for _ in range(scale)])
+
+def huge_paragraph(script, scale, seed=0):
+    rand = random.Random(seed)
+    return make_document([make_paragraph(rand, script, 0, words=scale * 20)])
+
+def deep_nesting(script, scale, seed=0):
+    rand = random.Random(seed)
+    return make_document([
+        make_paragraph(rand, script, 2, depth=30)
+        for _ in range(max(1, scale // 30))])
+
+def wide_inlines(script, scale, seed=0):
+    rand = random.Random(seed)
+    item = nodes.list_item()
+    item += make_paragraph(rand, script, scale * 2, words=2)
+    bullet_list = nodes.bullet_list()
+    bullet_list += item
+    return make_document([bullet_list])
+
+def large_tree(script, scale, seed=0):
+    # About 20 nodes per scale, mostly containers and non-target elements.
+    # The large scale gives a doctree of about 100k nodes.
+    rand = random.Random(seed)
+    sections = []
+    for _ in range(max(1, scale * 2 // 3)):
+        section = nodes.section()
+        section += nodes.title(text=make_text(rand, script, 2))
+        bullet_list = nodes.bullet_list()
+        for _ in range(4):
+            item = nodes.list_item()
+            item += make_paragraph(rand, script, 1, words=2)
+            bullet_list += item
+        section += bullet_list
+        section += nodes.literal_block(text=make_text(rand, script, 4))
+        section += nodes.comment(text=make_text(rand, script, 2))
+        sections.append(section)
+    return make_document(sections)
+
+def reference_page(script, scale, seed=0):
+    # A generated reference page: short prose and large tables, about
+    # 25 nodes per scale.
+    rand = random.Random(seed)
+    sections = []
+    for _ in range(max(1, scale // 20)):
+        section = nodes.section()
+        section += nodes.title(text=make_text(rand, script, 2))
+        section += make_paragraph(rand, script, 2)
+        tbody = nodes.tbody()
+        for _ in range(20):
+            row = nodes.row()
+            for _ in range(3):
+                entry = nodes.entry()
+                entry += nodes.paragraph(text=make_text(rand, script, 2))
+                row += entry
+            tbody += row
+        section += nodes.table('', nodes.tgroup('', tbody))
+        sections.append(section)
+    return make_document(sections)
+
+SHAPES = {
+    'small_paragraphs': small_paragraphs,
+    'huge_paragraph': huge_paragraph,
+    'deep_nesting': deep_nesting,
+    'wide_inlines': wide_inlines,
+    'large_tree': large_tree,
+    'reference_page': reference_page,
+}
+
+def count_texts(doctree):
+    texts = list(findall(doctree, nodes.Text))
+    return len(texts), sum(len(txt) for txt in texts)
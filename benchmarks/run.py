@@ -0,0 +1,158 @@
+# Benchmark suite of the trimming pipeline.
+#
+#   python benchmarks/run.py --output results.json
+#   python benchmarks/run.py --compare results.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from types import SimpleNamespace
+from docutils import nodes
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import corpus  # pylint: disable=wrong-import-position
+import table_trimmer  # pylint: disable=wrong-import-position
+from sphinxcontrib import trimblank  # pylint: disable=wrong-import-position
+
+SCALES = {'small': 100, 'medium': 1000, 'large': 5000}
+
+class FakeApp(object):
+    # Just enough of Sphinx to call the event handlers of the extension.
+    def __init__(self, builder_name='html', **overrides):
+        self.config = SimpleNamespace()
+        self.handlers = {}
+        trimblank.setup(self)
+        for name, value in overrides.items():
+            setattr(self.config, name, value)
+        self.builder = SimpleNamespace(name=builder_name)
+        self.env = SimpleNamespace()
+        self.emit('config-inited', self.config)
+        self.emit('builder-inited')
+
+    def add_config_value(self, name, default, _rebuild, _types=None):
+        setattr(self.config, name, default)
+
+    def connect(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def add_post_transform(self, _transform):
+        pass
+
+    def emit(self, event, *args):
+        for handler in self.handlers.get(event, []):
+            handler(self, *args)
+
+def measure(func, setup, repeat):
+    times = timeit.repeat(func, setup, number=1, repeat=repeat)
+    return {'min': min(times), 'median': statistics.median(times),
+            'repeat': repeat}
+
+def bench_trimmer(results, doctree, name, repeat):
+    texts = [str(txt) for txt in trimblank.findall(doctree, nodes.Text)]
+    for backend, trimmer_cls in sorted(table_trimmer.TRIMMER_BACKENDS.items()):
+        trimmer = trimmer_cls(False, r'[\s(]', r'[\s),.:?]')
+        results['trimmer.%s.trim_blank/%s' % (backend, name)] = measure(
+            lambda: [trimmer.trim_blank(txt) for txt in texts], 'pass', repeat)
+        results['trimmer.%s.trim_head/%s' % (backend, name)] = measure(
+            lambda: [trimmer.trim_head(txt, 'あ') for txt in texts],
+            'pass', repeat)
+        results['trimmer.%s.trim_tail/%s' % (backend, name)] = measure(
+            lambda: [trimmer.trim_tail(txt, 'あ') for txt in texts],
+            'pass', repeat)
+    results['trim_many/%s' % name] = measure(
+        lambda: list(trimblank.trim_many(texts)), 'pass', repeat)
+
+def bench_pipeline(results, doctree, name, repeat):
+    trimmer = trimblank.Trimmer(False, r'[\s(]', r'[\s),.:?]')
+    app = FakeApp()
+    copies = []
+    def setup():
+        copies.append(doctree.deepcopy())
+    def run_visitor():
+        copied = copies.pop()
+        trimblank.TrimblankVisitor(copied, trimmer).traverse(copied)
+    def run_visitor_walk():
+        copied = copies.pop()
+        copied.walk(trimblank.TrimblankVisitor(copied, trimmer))
+    def run_handler():
+        trimblank.trimblank(app, copies.pop(), 'index')
+    pruning_app = FakeApp(trimblank_skip_nodes=['table'])
+    def run_pruning_handler():
+        trimblank.trimblank(pruning_app, copies.pop(), 'index')
+    results['visitor/%s' % name] = measure(run_visitor, setup, repeat)
+    results['visitor.walk/%s' % name] = measure(
+        run_visitor_walk, setup, repeat)
+    results['handler/%s' % name] = measure(run_handler, setup, repeat)
+    results['handler.skip_tables/%s' % name] = measure(
+        run_pruning_handler, setup, repeat)
+
+def run(scales, shapes, scripts, repeat):
+    results = {}
+    for scale_name in scales:
+        for shape in shapes:
+            for script in scripts:
+                doctree = corpus.SHAPES[shape](script, SCALES[scale_name])
+                name = '%s/%s/%s' % (shape, script, scale_name)
+                print('running %s ...' % name, file=sys.stderr)
+                bench_trimmer(results, doctree, name, repeat)
+                bench_pipeline(results, doctree, name, repeat)
+    return results
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print('%-60s %10s %10s %7s' % ('benchmark', 'base [ms]', 'now [ms]', 'ratio'))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        base = baseline[name]['min']
+        now = results[name]['min']
+        ratio = now / base if base else float('inf')
+        mark = ' !' if ratio > threshold else ''
+        print('%-60s %10.3f %10.3f %7.2f%s'
+              % (name, base * 1e3, now * 1e3, ratio, mark))
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark suite of sphinxcontrib-trimblank')
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES))
+    parser.add_argument('--shape', action='append', choices=sorted(corpus.SHAPES))
+    parser.add_argument('--script', action='append', choices=sorted(corpus.SCRIPTS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON to the file')
+    parser.add_argument('--compare', help='JSON results to compare with')
+    parser.add_argument(
+        '--threshold', type=float, default=1.2,
+        help='ratio to the baseline reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.scale or ['small', 'medium'],
+                  args.shape or sorted(corpus.SHAPES),
+                  args.script or sorted(corpus.SCRIPTS), args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline)['results'],
+                                  args.threshold)
+        if regressions:
+            print('%d benchmarks regressed' % len(regressions))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Alternative backend of Trimmer compared by the benchmarks, which decides
+# with a character table instead of regular expressions. The extension uses
+# only Trimmer: TableTrimmer is slower, and takes only single-character
+# keep_blank_before/after.
+import re
+from sphinxcontrib.trimblank.trimmer import (
+    Trimmer, _get_width, _remove_chars, to_char_ranges)
+
+class CharClasses(dict):
+    # Lazily filled str.translate table from a code point to a letter, whose
+    # low 4 bits are flags of classes of the character.
+    SPACE, CJK, BEFORE, AFTER = 1, 2, 4, 8
+
+    def __init__(self, keep_blank_before, keep_blank_after, char_ranges):
+        super(CharClasses, self).__init__()
+        self._before = keep_blank_before
+        self._after = keep_blank_after
+        self._char_ranges = char_ranges
+
+    def __missing__(self, code):
+        char = chr(code)
+        flags = 0
+        if char.isspace():
+            flags |= CharClasses.SPACE
+        if self._char_ranges[char]:
+            flags |= CharClasses.CJK
+        if self._before.match(char):
+            flags |= CharClasses.BEFORE
+        if self._after.match(char):
+            flags |= CharClasses.AFTER
+        letter = self[code] = chr(0x40 | flags)
+        return letter
+
+    def flags(self, char):
+        return ord(self[ord(char)]) & 0xF
+
+# bytes.translate table from the letters of CharClasses to b' ' for blanks.
+BLANK_MARKS = bytes(
+    ord(' ') if code & CharClasses.SPACE and code >> 4 == 4 else ord('.')
+    for code in range(256))
+
+
+class TableTrimmer(object):
+    # Same as Trimmer, but decides with a character table instead of regular
+    # expressions. keep_blank_before/after must match single characters.
+
+    def __init__(self, keep_alnum_blank, keep_blank_before, keep_blank_after,
+                 char_ranges=None):
+        self.char_ranges = to_char_ranges(char_ranges)
+        patterns = []
+        for pattern in (keep_blank_before, keep_blank_after):
+            if _get_width(pattern) != (1, 1):
+                raise ValueError(
+                    '%r does not match exactly one character' % pattern)
+            patterns.append(re.compile(pattern))
+        self._condition = all if keep_alnum_blank else any
+        self._classes = CharClasses(patterns[0], patterns[1],
+                                     self.char_ranges)
+        self._removable = TableTrimmer._make_removable_table(keep_alnum_blank)
+
+    def trim_blank(self, target_txt):
+        if len(target_txt) > Trimmer.CHUNK_SIZE:
+            return _remove_chars(target_txt, self._iter_removed(target_txt))
+        # Indexing bytes gives the letters as ints. Both ends are padded with
+        # a letter without flags, so the n-th character is at n + 1.
+        classes = b'@%s@' % target_txt.translate(self._classes).encode('ascii')
+        blanks = classes.translate(BLANK_MARKS)
+        idx = blanks.find(b' ')
+        if idx == -1:
+            return target_txt
+        removable = self._removable
+        result = []
+        start = 0
+        while idx != -1:
+            if removable[classes[idx - 1] << 8 | classes[idx + 1]]:
+                result.append(target_txt[start:idx - 1])
+                start = idx
+            idx = blanks.find(b' ', idx + 1)
+        if start == 0:
+            return target_txt
+        result.append(target_txt[start:])
+        return ''.join(result)
+
+    def _iter_removed(self, target_txt):
+        # Yield the indices of removed blanks, building the class letters of
+        # a chunk with one character of context on each side at a time.
+        chunk_size = Trimmer.CHUNK_SIZE
+        removable = self._removable
+        for start in range(0, len(target_txt), chunk_size):
+            end = start + chunk_size
+            classes = target_txt[max(start - 1, 0):end + 1].translate(
+                self._classes).encode('ascii')
+            # The n-th character is at n - start + 1 as in trim_blank.
+            if start == 0:
+                classes = b'@' + classes
+            if end >= len(target_txt):
+                classes += b'@'
+            blanks = classes.translate(BLANK_MARKS)
+            last = len(classes) - 1
+            idx = blanks.find(b' ', 1, last)
+            while idx != -1:
+                if removable[classes[idx - 1] << 8 | classes[idx + 1]]:
+                    yield start + idx - 1
+                idx = blanks.find(b' ', idx + 1, last)
+
+    @staticmethod
+    def _make_removable_table(keep_alnum_blank):
+        # Whether a blank is removed, indexed by the letters of the previous
+        # and next characters as (prev << 8 | next).
+        cjk = CharClasses.CJK
+        before, after = CharClasses.BEFORE, CharClasses.AFTER
+        table = bytearray(1 << 16)
+        for prev_flags in range(16):
+            for next_flags in range(16):
+                if keep_alnum_blank:
+                    remove = prev_flags & cjk and next_flags & cjk
+                else:
+                    remove = ((prev_flags & cjk and not next_flags & before)
+                              or (next_flags & cjk and not prev_flags & after))
+                table[(0x40 | prev_flags) << 8 | 0x40 | next_flags] = (
+                    1 if remove else 0)
+        return bytes(table)
+
+    def trim_blanks(self, target_txts):
+        return [self.trim_blank(txt) for txt in target_txts]
+
+    def trim_head(self, target_txt, leading_txt):
+        if self._starts_with(target_txt, CharClasses.BEFORE):
+            return target_txt
+        if not self._condition((
+                self._ends_with(leading_txt, 0, CharClasses.CJK),
+                self._starts_with(target_txt, CharClasses.CJK))):
+            return target_txt
+        return target_txt.lstrip()
+
+    def trim_tail(self, target_txt, following_txt):
+        if self._ends_with(
+                target_txt, CharClasses.AFTER, CharClasses.SPACE):
+            return target_txt
+        if not self._condition((
+                self._ends_with(
+                    target_txt, CharClasses.CJK, CharClasses.SPACE),
+                following_txt[:1] and
+                self._classes.flags(following_txt[0]) & CharClasses.CJK)):
+            return target_txt
+        return target_txt.rstrip()
+
+    def _starts_with(self, txt, second_flag):
+        # Same as re.match(r'\s<second>', txt)
+        return (len(txt) >= 2
+                and self._classes.flags(txt[0]) & CharClasses.SPACE
+                and self._classes.flags(txt[1]) & second_flag)
+
+    def _ends_with(self, txt, first_flag, last_flag):
+        # Same as re.search(r'<first><last>$', txt), where first_flag 0 means
+        # no first character. '$' also matches before a trailing newline.
+        num_chars = 2 if first_flag else 1
+        for end in (len(txt), len(txt) - 1):
+            if end < num_chars:
+                return False
+            if ((not first_flag
+                 or self._classes.flags(txt[end - 2]) & first_flag)
+                    and self._classes.flags(txt[end - 1]) & last_flag):
+                return True
+            if txt[-1] != '\n':
+                return False
+        return False
+
+# Trimmer classes compared by the benchmarks.
+TRIMMER_BACKENDS = {'regex': Trimmer, 'table': TableTrimmer}
@@ -0,0 +1,34 @@
+# Measure how TrimblankVisitor scales with the number of inline children in
+# a paragraph. Time per child should stay flat as the paragraph grows.
+import sys
+import timeit
+from unittest.mock import Mock
+from docutils import nodes
+from sphinxcontrib.trimblank import Trimmer, TrimblankVisitor
+
+def make_doctree(num_children):
+    paragraph = nodes.paragraph()
+    for idx in range(num_children // 2):
+        paragraph += nodes.Text('項目 %d の説明\n' % idx)
+        paragraph += nodes.reference(text='参照%d' % idx)
+    doctree = nodes.document(Mock(), Mock())
+    doctree += paragraph
+    return doctree
+
+def main(argv):
+    sizes = [int(arg) for arg in argv] or [1000, 2000, 4000, 8000, 16000]
+    trimmer = Trimmer(False, r'[\s(]', r'[\s),.:?]')
+    print('%10s %12s %14s' % ('children', 'total [ms]', 'per child [us]'))
+    for size in sizes:
+        doctrees = []
+        def setup():
+            doctrees.append(make_doctree(size))
+        def run():
+            doctree = doctrees.pop()
+            TrimblankVisitor(doctree, trimmer).traverse(doctree)
+        elapsed = min(timeit.repeat(run, setup, number=1, repeat=5))
+        print('%10d %12.2f %14.3f'
+              % (size, elapsed * 1e3, elapsed * 1e6 / size))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -16,10 +16,15 @@ setup(
     author='amedama41',
     author_email='kamo.devel41@gmail.com',
     keywords=['sphinx', 'extension'],
-    packages=['sphinxcontrib'],
+    packages=['sphinxcontrib', 'sphinxcontrib.trimblank'],
     namespace_packages=['sphinxcontrib'],
     install_requires=["Sphinx"],
-    python_requires='>=3.5.*',
+    python_requires='>=3.7',
+    entry_points={
+        'console_scripts': [
+            'sphinx-trimblank = sphinxcontrib.trimblank:main',
+        ],
+    },
     classifiers=[
         'Framework :: Sphinx :: Extension',
         'License :: OSI Approved :: MIT License',
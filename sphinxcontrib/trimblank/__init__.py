@@ -0,0 +1,485 @@
+import collections
+import cProfile
+import importlib
+import json
+import marshal
+import os
+import re
+import time
+from docutils import nodes
+from docutils.transforms import Transform
+from .batch import (
+    iter_batch_files, iter_trim_files, main, trim_file, trim_files, trim_many,
+    trim_text, try_trim_file)
+from .source import SourceTrimmer
+from .trimmer import (
+    CJK_RANGES, DEFAULT_KEEP_BLANK_AFTER, DEFAULT_KEEP_BLANK_BEFORE,
+    CachingTrimmer, CharRanges, Trimmer, contains_cjk, get_shared_char_ranges,
+    get_shared_trimmer, is_cjk_char, to_char_ranges)
+from .visitor import (
+    ReadTrimblankVisitor, ResolvedTrimblankVisitor, TrimblankVisitor, findall,
+    get_head_chars, get_shape, get_tail_chars, get_text, get_texts,
+    get_trimmed_texts, has_cjk_text, iter_texts)
+
+def get_bool_value(config, builder_name):
+    if not isinstance(config, (list, tuple)):
+        return config
+    return builder_name in config
+
+def get_trimmer_key(config, builder_name):
+    if not get_bool_value(config.trimblank_enabled, builder_name):
+        return None
+    return bool(get_bool_value(config.trimblank_keep_alnum_blank, builder_name))
+
+def get_variant_keys(config, builder_name, disabled=False):
+    # builder_name None stands for any builder which is not listed explicitly.
+    # With disabled, the key None of builders without trimming is included.
+    builder_names = {builder_name, None}
+    for value in (config.trimblank_enabled, config.trimblank_keep_alnum_blank):
+        if isinstance(value, (list, tuple)):
+            builder_names.update(value)
+    keys = {get_trimmer_key(config, name) for name in builder_names}
+    return [key for key in ((None,) if disabled else ()) + (False, True)
+            if key in keys]
+
+def get_char_ranges(config):
+    return get_shared_char_ranges(config.trimblank_char_ranges)
+
+def get_trimmer(config, key):
+    return get_shared_trimmer(
+        config.trimblank_cache_size, get_char_ranges(config), key,
+        config.trimblank_keep_blank_before, config.trimblank_keep_blank_after)
+
+# Node classes of trimblank_skip_nodes, keyed by the configuration value.
+_SKIP_NODES = {}
+
+def get_node_class(name):
+    if isinstance(name, type):
+        node_cls = name
+    elif '.' in name:
+        module_name, _, class_name = name.rpartition('.')
+        node_cls = getattr(importlib.import_module(module_name), class_name,
+                           None)
+    else:
+        from sphinx import addnodes
+        node_cls = getattr(nodes, name, None) or getattr(addnodes, name, None)
+    if not (isinstance(node_cls, type) and issubclass(node_cls, nodes.Node)):
+        raise ValueError('%r is not a node class' % (name,))
+    return node_cls
+
+def get_skip_nodes(config):
+    names = tuple(config.trimblank_skip_nodes)
+    skip_nodes = _SKIP_NODES.get(names)
+    if skip_nodes is None:
+        skip_nodes = tuple(get_node_class(name) for name in names)
+        _SKIP_NODES[names] = skip_nodes
+    return skip_nodes
+
+def get_cache_info(config):
+    info = collections.Counter()
+    for key in get_variant_keys(config, None):
+        trimmer = get_trimmer(config, key)
+        if isinstance(trimmer, CachingTrimmer):
+            info.update(trimmer.cache_info())
+    return dict(info)
+
+def compile_trimmers(_app, config):
+    from sphinx.errors import ConfigError
+    if config.trimblank_engine not in ('node', 'batch'):
+        raise ConfigError(
+            "trimblank_engine must be 'node' or 'batch', not %r"
+            % (config.trimblank_engine,))
+    for name in ('trimblank_keep_blank_before', 'trimblank_keep_blank_after'):
+        try:
+            re.compile(getattr(config, name))
+        except re.error as exc:
+            raise ConfigError(
+                'Invalid regular expression in %s (%r): %s'
+                % (name, getattr(config, name), exc)) from exc
+    try:
+        get_char_ranges(config)
+    except ValueError as exc:
+        raise ConfigError('Invalid interval in trimblank_char_ranges: %s'
+                          % exc) from exc
+    # Patterns valid by themselves may still be rejected in the lookarounds
+    # of the trimmers, e.g. ones of variable widths in a look-behind.
+    for key in get_variant_keys(config, None):
+        try:
+            get_trimmer(config, key)
+        except re.error as exc:
+            raise ConfigError(
+                'Invalid regular expression in trimblank_keep_blank_before '
+                '(%r) or trimblank_keep_blank_after (%r): %s'
+                % (config.trimblank_keep_blank_before,
+                   config.trimblank_keep_blank_after, exc)) from exc
+    try:
+        get_skip_nodes(config)
+    except (ImportError, ValueError) as exc:
+        raise ConfigError('Invalid node class in trimblank_skip_nodes: %s'
+                          % exc) from exc
+    # Sources are trimmed before they are parsed, so nodes to skip are not
+    # known yet.
+    if config.trimblank_trim_source and (config.trimblank_skip_nodes
+                                         or config.trimblank_skip_classes):
+        raise ConfigError(
+            'trimblank_trim_source cannot be used with trimblank_skip_nodes '
+            'or trimblank_skip_classes')
+
+def get_logger(config):
+    if not config.trimblank_debug:
+        return None
+    from sphinx.util import logging
+    return logging.getLogger(__name__)
+
+def make_record(config, builder_name, doctree):
+    # Trim doctree for builder_name and return the record to finish trimming
+    # it for any builder after it is resolved.
+    from sphinx import addnodes
+    key = get_trimmer_key(config, builder_name)
+    batch = config.trimblank_engine == 'batch'
+    visitor = ReadTrimblankVisitor(
+        doctree, None if key is None else get_trimmer(config, key),
+        get_logger(config), batch)
+    # The untrimmed texts are recorded even if trimming is enabled for all
+    # builders, to restore targets which are changed after they are read.
+    visitor.others = {
+        other: None if other is None else TrimblankVisitor(
+            doctree, get_trimmer(config, other), batch=batch)
+        for other in [None] + get_variant_keys(config, builder_name)
+        if other != key}
+    visitor.skip_nodes = get_skip_nodes(config)
+    visitor.skip_classes = frozenset(config.trimblank_skip_classes)
+    visitor.char_ranges = get_char_ranges(config)
+    visitor.unresolved = addnodes.pending_xref
+    visitor.trim_and_record(doctree)
+    return {'key': key, 'shapes': visitor.shapes, 'texts': visitor.texts}
+
+def trimblank_at_read(app, doctree):
+    if (not app.config.trimblank_trim_at_read
+            or not get_variant_keys(app.config, app.builder.name)):
+        return
+    start = time.perf_counter()
+    if not hasattr(app.env, 'trimblank_records'):
+        app.env.trimblank_records = {}
+    if app.config.trimblank_profile > 0:
+        record, profile = run_profiled(
+            doctree, bool(app.config.trimblank_profile_stats),
+            make_record, app.config, app.builder.name, doctree)
+        for name in ('trimblank_read_profiles', 'trimblank_read_stats'):
+            if not hasattr(app.env, name):
+                setattr(app.env, name, {})
+        add_profile(app.env.trimblank_read_profiles,
+                    app.env.trimblank_read_stats, app.env.docname, profile,
+                    app.config.trimblank_profile)
+    else:
+        record = make_record(app.config, app.builder.name, doctree)
+    app.env.trimblank_records[app.env.docname] = record
+    if app.config.trimblank_metrics_file:
+        if not hasattr(app.env, 'trimblank_read_times'):
+            app.env.trimblank_read_times = {}
+        app.env.trimblank_read_times[app.env.docname] = (
+            time.perf_counter() - start)
+
+def match_read_targets(doctree, docname, records, config):
+    # Return (target, record, path) of the targets of doctree which are at the
+    # paths of targets of the same classes and lines when they were read,
+    # keyed by their ids. Documents assembled into doctree start at
+    # start_of_file nodes.
+    from sphinx import addnodes
+    visitor = TrimblankVisitor(doctree, None)
+    visitor.skip_nodes = get_skip_nodes(config)
+    visitor.skip_classes = frozenset(config.trimblank_skip_classes)
+    matched = {}
+    for root, path, node in visitor.iter_targets(
+            doctree, (addnodes.start_of_file,)):
+        record = records.get(docname if root is doctree else root['docname'])
+        shape = None if record is None else record['shapes'].get(path)
+        if shape is not None and shape[:2] == (type(node).__name__, node.line):
+            matched[id(node)] = (node, record, path)
+    return matched
+
+
+class ReadTargetMatcher(Transform):
+    # Post-transform matching targets to the records of trimblank_trim_at_read
+    # right after references are resolved, while the other nodes are still at
+    # the positions they were read at: later post-transforms (e.g. of only
+    # nodes) move them. doctree-resolved finishes trimming with the matches.
+    default_priority = 20
+
+    def apply(self, **_kwargs):
+        env = self.document.settings.env
+        if env.config.trimblank_trim_at_read:
+            self.document.trimblank_matched = match_read_targets(
+                self.document, env.docname,
+                getattr(env, 'trimblank_records', {}), env.config)
+
+def trimblank_source(app, docname, source):
+    config = app.config
+    # The source is read once for all builders, so it is trimmed only if
+    # trimming is enabled for all of them.
+    if (not config.trimblank_trim_source
+            or isinstance(config.trimblank_enabled, (list, tuple))
+            or not config.trimblank_enabled):
+        return
+    from sphinx.errors import FiletypeNotFoundError
+    from sphinx.util import get_filetype
+    try:
+        filetype = get_filetype(config.source_suffix,
+                                app.env.doc2path(docname))
+    except FiletypeNotFoundError:
+        return
+    if filetype != 'restructuredtext':
+        return
+    trimmers = [get_trimmer(config, key)
+                for key in get_variant_keys(config, None)]
+    source[0] = SourceTrimmer(trimmers).trim_source(source[0])
+
+# Attributes of the environment which are stored for each document.
+ENV_ATTRIBUTES = ('trimblank_records', 'trimblank_read_times',
+                  'trimblank_read_profiles', 'trimblank_read_stats')
+
+def reset_read_times(_app, env, _docnames):
+    env.trimblank_read_times = {}
+    env.trimblank_read_profiles = {}
+    env.trimblank_read_stats = {}
+
+def purge_records(_app, env, docname):
+    for name in ENV_ATTRIBUTES:
+        if hasattr(env, name):
+            getattr(env, name).pop(docname, None)
+
+def merge_records(_app, env, docnames, other):
+    for name in ENV_ATTRIBUTES:
+        if not hasattr(other, name):
+            continue
+        if not hasattr(env, name):
+            setattr(env, name, {})
+        values, other_values = getattr(env, name), getattr(other, name)
+        for docname in docnames:
+            if docname in other_values:
+                values[docname] = other_values[docname]
+
+def trimblank(app, doctree, docname):
+    profiles = app.trimblank_profiles
+    if (profiles is None
+            or get_trimmer_key(app.config, app.builder.name) is None):
+        trim_document(app, doctree, docname)
+        return
+    _, profile = run_profiled(
+        doctree, bool(app.config.trimblank_profile_stats),
+        trim_document, app, doctree, docname)
+    add_profile(profiles, app.trimblank_profile_stats, docname, profile,
+                app.config.trimblank_profile)
+
+def trim_document(app, doctree, docname):
+    key = get_trimmer_key(app.config, app.builder.name)
+    at_read = app.config.trimblank_trim_at_read
+    if key is None and not at_read:
+        return
+    trimmer = None if key is None else get_trimmer(app.config, key)
+    logger = get_logger(app.config)
+
+    batch = app.config.trimblank_engine == 'batch'
+    if at_read:
+        # Texts of the documents may be trimmed for another builder.
+        visitor = ResolvedTrimblankVisitor(doctree, trimmer, logger, batch)
+        visitor.key = key
+        visitor.matched = vars(doctree).pop('trimblank_matched', {})
+        visitor.restore_unvisited(doctree)
+    else:
+        visitor = TrimblankVisitor(doctree, trimmer, logger, batch)
+    visitor.skip_nodes = get_skip_nodes(app.config)
+    visitor.skip_classes = frozenset(app.config.trimblank_skip_classes)
+    metrics = app.trimblank_metrics
+    if metrics is not None and app.config.trimblank_metrics_samples > 0:
+        visitor.samples = []
+        visitor.max_samples = app.config.trimblank_metrics_samples
+    start = time.perf_counter()
+    visitor.traverse(doctree)
+    elapsed = time.perf_counter() - start
+    app.trimblank_stats['trimmed'] += visitor.num_trimmed
+    app.trimblank_stats['skipped'] += visitor.num_skipped
+    if metrics is not None:
+        metrics[docname] = {
+            'visited': visitor.num_visited,
+            'trimmed': visitor.num_trimmed,
+            'skipped': visitor.num_skipped,
+            'changed': visitor.num_changed,
+            'removed': visitor.num_removed,
+            'pruned': visitor.num_pruned,
+            'time': elapsed,
+        }
+        if visitor.samples:
+            app.trimblank_samples[docname] = visitor.samples
+
+def init_stats(app):
+    app.trimblank_stats = collections.Counter()
+    if app.config.trimblank_metrics_file:
+        app.trimblank_metrics = {}
+        app.trimblank_samples = {}
+    else:
+        app.trimblank_metrics = None
+    if app.config.trimblank_profile > 0:
+        app.trimblank_profiles = {}
+        app.trimblank_profile_stats = {}
+    else:
+        app.trimblank_profiles = None
+
+def report_stats(app, exception):
+    stats = getattr(app, 'trimblank_stats', None)
+    if stats:
+        from sphinx.util import logging
+        logger = logging.getLogger(__name__)
+        logger.verbose(
+            'trimblank: trimmed %d elements, skipped %d elements '
+            'without CJK characters', stats['trimmed'], stats['skipped'])
+        if app.config.trimblank_cache_size > 0:
+            cache_info = get_cache_info(app.config)
+            logger.verbose(
+                'trimblank: cache hits %d, misses %d',
+                cache_info['hits'], cache_info['misses'])
+    if exception is None and getattr(app, 'trimblank_metrics', None) is not None:
+        write_metrics(app)
+    if exception is None and getattr(app, 'trimblank_profiles', None) is not None:
+        report_profiles(app)
+
+def write_metrics(app):
+    documents = {}
+    for docname, metrics in app.trimblank_metrics.items():
+        documents[docname] = dict(metrics)
+    read_times = getattr(app.env, 'trimblank_read_times', {})
+    for docname, read_time in read_times.items():
+        documents.setdefault(docname, {})['read_time'] = read_time
+    total = collections.Counter()
+    for metrics in documents.values():
+        total.update(metrics)
+    report = {
+        'builder': app.builder.name,
+        'total': dict(total),
+        'documents': documents,
+    }
+    if app.config.trimblank_cache_size > 0:
+        report['cache'] = get_cache_info(app.config)
+    path = os.path.join(app.outdir, app.config.trimblank_metrics_file)
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, ensure_ascii=False, indent=1, sort_keys=True)
+    if not app.trimblank_samples:
+        return
+    with open(os.path.splitext(path)[0] + '.diff', 'w',
+              encoding='utf-8') as output:
+        for docname in sorted(app.trimblank_samples):
+            for line, old_txt, new_txt in app.trimblank_samples[docname]:
+                output.write('@@ %s:%s\n-%r\n+%r\n' % (
+                    docname, line or '', old_txt, new_txt))
+
+def run_profiled(doctree, with_stats, func, *args):
+    # Call func(*args), which trims doctree, and return its result and a
+    # profile: the wall time, the number and total length of Text nodes, and
+    # cProfile stats (in the format of pstats files) if with_stats is true.
+    num_texts = num_chars = 0
+    for txt in findall(doctree, nodes.Text):
+        num_texts += 1
+        num_chars += len(txt)
+    profiler = cProfile.Profile() if with_stats else None
+    start = time.perf_counter()
+    if profiler is None:
+        result = func(*args)
+    else:
+        result = profiler.runcall(func, *args)
+    profile = {'time': time.perf_counter() - start,
+               'texts': num_texts, 'chars': num_chars}
+    if profiler is not None:
+        profiler.create_stats()
+        profile['stats'] = profiler.stats
+    return result, profile
+
+def add_profile(profiles, stats, docname, profile, top):
+    # cProfile stats are kept only for the top slowest documents.
+    profile = dict(profile)
+    if 'stats' in profile:
+        stats[docname] = profile.pop('stats')
+    profiles[docname] = profile
+    if len(stats) > top:
+        del stats[min(stats, key=lambda name: profiles[name]['time'])]
+
+def rank_profiles(read_profiles, write_profiles, top):
+    # Return the number of profiled documents, their total time, and rows of
+    # (docname, total time, read time, write time, Text nodes, text length)
+    # of the top slowest ones.
+    rows = {}
+    for idx, profiles in enumerate((read_profiles, write_profiles)):
+        for docname, profile in profiles.items():
+            row = rows.setdefault(docname, [docname, 0, 0, 0, 0, 0])
+            row[1] += profile['time']
+            row[2 + idx] = profile['time']
+            row[4] = max(row[4], profile['texts'])
+            row[5] = max(row[5], profile['chars'])
+    ranked = sorted(rows.values(), key=lambda row: (-row[1], row[0]))
+    return (len(rows), sum(row[1] for row in ranked),
+            [tuple(row) for row in ranked[:top]])
+
+def report_profiles(app):
+    from sphinx.util import logging
+    logger = logging.getLogger(__name__)
+    read_profiles = getattr(app.env, 'trimblank_read_profiles', {})
+    num_docs, total, rows = rank_profiles(
+        read_profiles, app.trimblank_profiles, app.config.trimblank_profile)
+    if not rows:
+        return
+    logger.info('trimblank: %d slowest of %d documents (%.1f ms in total)',
+                len(rows), num_docs, total * 1e3)
+    logger.info('%5s %10s %10s %10s %8s %10s  %s', 'rank', 'time [ms]',
+                'read [ms]', 'write [ms]', 'texts', 'chars', 'docname')
+    for rank, (docname, elapsed, read_time, write_time, num_texts,
+               num_chars) in enumerate(rows, 1):
+        logger.info('%5d %10.2f %10.2f %10.2f %8d %10d  %s', rank,
+                    elapsed * 1e3, read_time * 1e3, write_time * 1e3,
+                    num_texts, num_chars, docname)
+    if not app.config.trimblank_profile_stats:
+        return
+    directory = os.path.join(app.outdir, app.config.trimblank_profile_stats)
+    read_stats = getattr(app.env, 'trimblank_read_stats', {})
+    for docname, _, _, _, _, _ in rows:
+        for suffix, stats in (('.read.prof', read_stats),
+                              ('.prof', app.trimblank_profile_stats)):
+            if docname not in stats:
+                continue
+            path = os.path.join(directory, docname + suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as output:
+                marshal.dump(stats[docname], output)
+    logger.info('trimblank: cProfile stats are written in %s', directory)
+
+def setup(app):
+    types = (bool, list, tuple)
+    app.add_config_value('trimblank_enabled', True, 'env', types)
+    app.add_config_value('trimblank_keep_alnum_blank', False, 'env', types)
+    app.add_config_value('trimblank_keep_blank_before',
+                         DEFAULT_KEEP_BLANK_BEFORE, 'env', str)
+    app.add_config_value('trimblank_keep_blank_after',
+                         DEFAULT_KEEP_BLANK_AFTER, 'env', str)
+    app.add_config_value('trimblank_debug', False, 'env')
+    app.add_config_value('trimblank_trim_at_read', False, 'env')
+    app.add_config_value('trimblank_trim_source', False, 'env')
+    app.add_config_value('trimblank_char_ranges', Trimmer.CJK_INTERVALS, 'env',
+                         (list, tuple))
+    app.add_config_value('trimblank_skip_nodes', [], 'env', (list, tuple))
+    app.add_config_value('trimblank_skip_classes', [], 'env', (list, tuple))
+    app.add_config_value('trimblank_engine', 'node', 'env', str)
+    app.add_config_value('trimblank_cache_size', 0, 'env', int)
+    app.add_config_value('trimblank_metrics_file', None, '', (str, type(None)))
+    app.add_config_value('trimblank_metrics_samples', 0, '', int)
+    app.add_config_value('trimblank_profile', 0, '', int)
+    app.add_config_value('trimblank_profile_stats', None, '',
+                         (str, type(None)))
+    app.connect("config-inited", compile_trimmers)
+    app.connect("builder-inited", init_stats)
+    app.connect("env-before-read-docs", reset_read_times)
+    app.connect("source-read", trimblank_source)
+    app.connect("doctree-read", trimblank_at_read)
+    app.connect("env-purge-doc", purge_records)
+    app.connect("env-merge-info", merge_records)
+    app.connect("doctree-resolved", trimblank)
+    app.add_post_transform(ReadTargetMatcher)
+    app.connect("build-finished", report_stats)
+    return {'parallel_read_safe': True, 'parallel_write_safe': True}
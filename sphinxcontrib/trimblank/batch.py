@@ -0,0 +1,248 @@
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import os
+import pickle
+import re
+import sys
+import time
+import unicodedata
+from .trimmer import (
+    DEFAULT_KEEP_BLANK_AFTER, DEFAULT_KEEP_BLANK_BEFORE, Trimmer,
+    get_shared_trimmer, to_char_ranges)
+from .visitor import TrimblankVisitor
+
+# The trimmer of a batch worker process, built once by _init_batch_worker.
+_BATCH_WORKER = {}
+
+def _init_batch_worker(options):
+    _BATCH_WORKER['trimmer'] = Trimmer(*options)
+
+def _trim_batch_file(paths):
+    return try_trim_file(paths[0], paths[1], _BATCH_WORKER['trimmer'])
+
+def iter_batch_files(source_dir, suffixes=('.doctree', '.txt')):
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(tuple(suffixes)):
+                yield os.path.relpath(os.path.join(dirpath, filename),
+                                      source_dir)
+
+# Indentation and list markers starting the lines of texts written by the text
+# builder, which are kept as they are.
+_TEXT_LINE_PREFIX = re.compile(r'[ \t]*(?:(?:[-*+\u2022]|\d+\.|[A-Za-z#]\.)[ \t]+)?')
+# Lines of tables, whose columns trimming would misalign.
+_TEXT_TABLE_LINE = re.compile(r'[ \t]*[+|]')
+# Underlines of section titles.
+_TEXT_UNDERLINE = re.compile(r'([=\-~"\'^*+#`])\1*\Z')
+
+def _column_width(txt):
+    # Same as the width of a title, which the text builder underlines.
+    return sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1
+               for char in txt)
+
+def trim_text(txt, trimmer):
+    # Trim a text written by the text builder line by line: line breaks may
+    # be between lines of literal blocks, or between titles and underlines,
+    # so they are kept with the indentation and list markers which start the
+    # lines. Lines of tables are left as they are, and the underlines of
+    # trimmed titles are shortened to the new widths.
+    lines = txt.splitlines(True)
+    bodies = [line.rstrip('\r\n') for line in lines]
+    starts = [None if _TEXT_TABLE_LINE.match(body)
+              else _TEXT_LINE_PREFIX.match(body).end() for body in bodies]
+    new_txts = iter(trimmer.trim_blanks(
+        [body[start:] for body, start in zip(bodies, starts)
+         if start is not None]))
+    new_lines = []
+    prev_body = prev_removed = None
+    for line, body, start in zip(lines, bodies, starts):
+        if (prev_removed and _TEXT_UNDERLINE.match(body)
+                and len(body) == _column_width(prev_body)):
+            new_body = body[prev_removed:]
+            if start is not None:
+                next(new_txts)
+        elif start is None:
+            new_body = body
+        else:
+            new_body = body[:start] + next(new_txts)
+        new_lines.append(new_body + line[len(body):])
+        prev_body, prev_removed = body, len(body) - len(new_body)
+    return ''.join(new_lines)
+
+def trim_file(source, destination, trimmer):
+    if source.endswith('.doctree'):
+        with open(source, 'rb') as source_file:
+            doctree = pickle.load(source_file)
+        visitor = TrimblankVisitor(doctree, trimmer)
+        visitor.traverse(doctree)
+        changed = visitor.num_changed > 0
+        data = pickle.dumps(doctree, pickle.HIGHEST_PROTOCOL)
+    else:
+        with open(source, encoding='utf-8', newline='') as source_file:
+            txt = source_file.read()
+        new_txt = trim_text(txt, trimmer)
+        changed = new_txt != txt
+        data = new_txt.encode('utf-8')
+    size = os.path.getsize(source)
+    if changed or source != destination:
+        dirname = os.path.dirname(destination)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(destination + '.tmp', 'wb') as output:
+            output.write(data)
+        os.replace(destination + '.tmp', destination)
+    return size, changed
+
+def try_trim_file(source, destination, trimmer):
+    # Same as trim_file, but returns (size, changed, error message) instead
+    # of raising, so that a broken file does not stop the others.
+    try:
+        size, changed = trim_file(source, destination, trimmer)
+    except Exception as exc:  # pylint: disable=broad-except
+        return 0, False, '%s: %s' % (type(exc).__name__, exc)
+    return size, changed, None
+
+def iter_trim_files(source_dir, output_dir=None, suffixes=('.doctree', '.txt'),
+                    workers=None, chunksize=8, keep_alnum_blank=False,
+                    keep_blank_before=DEFAULT_KEEP_BLANK_BEFORE,
+                    keep_blank_after=DEFAULT_KEEP_BLANK_AFTER,
+                    char_ranges=None):
+    if workers is not None and workers < 1:
+        raise ValueError('workers must be positive, not %r' % (workers,))
+    if chunksize < 1:
+        raise ValueError('chunksize must be positive, not %r' % (chunksize,))
+    options = (keep_alnum_blank, keep_blank_before, keep_blank_after,
+               to_char_ranges(char_ranges).intervals)
+    # Build the trimmer here so that invalid patterns are reported before
+    # any worker starts.
+    trimmer = Trimmer(*options)
+    if output_dir is None:
+        output_dir = source_dir
+    names = list(iter_batch_files(source_dir, suffixes))
+    paths = [(os.path.join(source_dir, name), os.path.join(output_dir, name))
+             for name in names]
+    if workers == 1:
+        results = (try_trim_file(source, destination, trimmer)
+                   for source, destination in paths)
+        for name, result in zip(names, results):
+            yield (name,) + result
+        return
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_batch_worker,
+            initargs=(options,)) as executor:
+        results = executor.map(_trim_batch_file, paths, chunksize=chunksize)
+        for name, result in zip(names, results):
+            yield (name,) + result
+
+def trim_files(source_dir, output_dir=None, **options):
+    stats = collections.Counter(files=0, changed=0, failed=0, bytes=0)
+    errors = []
+    start = time.perf_counter()
+    for name, size, changed, error in iter_trim_files(
+            source_dir, output_dir, **options):
+        stats['files'] += 1
+        stats['changed'] += changed
+        stats['bytes'] += size
+        if error is not None:
+            stats['failed'] += 1
+            errors.append((name, error))
+    stats = dict(stats)
+    stats['time'] = time.perf_counter() - start
+    stats['errors'] = errors
+    return stats
+
+def trim_many(segments, boundaries=False, keep_alnum_blank=False,
+              keep_blank_before=DEFAULT_KEEP_BLANK_BEFORE,
+              keep_blank_after=DEFAULT_KEEP_BLANK_AFTER, char_ranges=None,
+              cache_size=0, batch_size=256):
+    # Trim strings which are not in doctrees, yielding the results in order.
+    # With boundaries, segments are (leading, text, following) tuples, and
+    # blanks at the ends of the text are also trimmed as between text nodes
+    # when the leading/following text (or None) is given. Trimmers are
+    # shared by the calls with the same options.
+    if batch_size < 1:
+        raise ValueError('batch_size must be positive, not %r'
+                         % (batch_size,))
+    trimmer = get_shared_trimmer(
+        cache_size, char_ranges, bool(keep_alnum_blank),
+        keep_blank_before, keep_blank_after)
+    return _iter_trimmed(trimmer, iter(segments), boundaries, batch_size)
+
+def _iter_trimmed(trimmer, segments, boundaries, batch_size):
+    # Texts of each batch are trimmed with one scan by trim_blanks.
+    while True:
+        batch = list(itertools.islice(segments, batch_size))
+        if not batch:
+            return
+        if not boundaries:
+            yield from trimmer.trim_blanks(batch)
+            continue
+        new_txts = trimmer.trim_blanks([txt for _, txt, _ in batch])
+        for (leading, _, following), new_txt in zip(batch, new_txts):
+            if leading and new_txt[:1].isspace():
+                new_txt = trimmer.trim_head(
+                    new_txt, leading[-Trimmer.LEADING_CONTEXT:])
+            if following and new_txt[-1:].isspace():
+                new_txt = trimmer.trim_tail(
+                    new_txt, following[:Trimmer.FOLLOWING_CONTEXT])
+            yield new_txt
+
+def _char_range(value):
+    # 'START-END' of hexadecimal code points, such as 'AC00-D7AF'.
+    start, _, end = value.partition('-')
+    return int(start, 16), int(end or start, 16)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='sphinx-trimblank',
+        description='Trim redundant blanks in doctree pickles and '
+                    'UTF-8 text files under a directory.')
+    parser.add_argument('source_dir')
+    parser.add_argument(
+        '-o', '--output-dir',
+        help='write trimmed files here instead of overwriting the sources')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '--chunksize', type=int, default=8,
+        help='number of files sent to a worker at a time (default: 8)')
+    parser.add_argument(
+        '-s', '--suffix', action='append', dest='suffixes',
+        help='suffix of files to trim, may be repeated '
+             '(default: .doctree and .txt)')
+    parser.add_argument('--keep-alnum-blank', action='store_true')
+    parser.add_argument('--keep-blank-before',
+                        default=DEFAULT_KEEP_BLANK_BEFORE)
+    parser.add_argument('--keep-blank-after',
+                        default=DEFAULT_KEEP_BLANK_AFTER)
+    parser.add_argument(
+        '--char-range', type=_char_range, action='append', dest='char_ranges',
+        help='hexadecimal START-END code points of CJK characters, may be '
+             'repeated (default: the ranges of trimblank_char_ranges)')
+    args = parser.parse_args(argv)
+    try:
+        stats = trim_files(
+            args.source_dir, args.output_dir,
+            suffixes=tuple(args.suffixes or ('.doctree', '.txt')),
+            workers=args.jobs, chunksize=args.chunksize,
+            keep_alnum_blank=args.keep_alnum_blank,
+            keep_blank_before=args.keep_blank_before,
+            keep_blank_after=args.keep_blank_after,
+            char_ranges=args.char_ranges)
+    except (re.error, ValueError) as exc:
+        parser.error(str(exc))
+    for name, error in stats['errors']:
+        sys.stderr.write('trimblank: failed to trim %s: %s\n' % (
+            os.path.join(args.source_dir, name), error))
+    elapsed = max(stats['time'], 1e-9)
+    sys.stderr.write(
+        'trimblank: %d files (%d changed, %d failed), %d bytes in %.2fs '
+        '(%.1f files/s, %.2f MB/s)\n' % (
+            stats['files'], stats['changed'], stats['failed'], stats['bytes'],
+            stats['time'], stats['files'] / elapsed,
+            stats['bytes'] / elapsed / 1e6))
+    return 1 if stats['failed'] else 0
@@ -0,0 +1,241 @@
+import re
+from docutils.utils import punctuation_chars
+from .trimmer import Trimmer
+
+class _SourceState(object):
+    # Lines read by SourceTrimmer.iter_lines which tell how the next line is
+    # handled.
+
+    def __init__(self):
+        # Lines of the current paragraph and their indent.
+        self.block = []
+        self.block_indent = None
+        # Blocks right after lines passed through are not joined, since where
+        # they start cannot be told without parsing.
+        self.passed = False
+        self.joinable = True
+        # A mode of SourceTrimmer, or None for lines which may be joined.
+        self.mode = None
+        self.mode_indent = None
+
+    def set_mode(self, mode, indent=None):
+        self.mode = mode
+        self.mode_indent = indent
+
+    def take_block(self):
+        block, self.block = self.block, []
+        if block[-1].rstrip().endswith('::'):
+            self.set_mode(SourceTrimmer.MODE_LITERAL, self.block_indent)
+        return block
+
+
+class SourceTrimmer(object):
+    # Join line breaks between CJK characters in reST source before it is
+    # parsed. Only breaks which all trimmers would remove from the parsed text
+    # are joined, and only in plain paragraphs followed by a blank line; the
+    # removed line breaks are appended to that blank line to keep the line
+    # numbers of the following blocks. Literal blocks, tables, comments and
+    # the other explicit markup blocks except BODY_DIRECTIVES are left alone.
+    BODY_DIRECTIVES = frozenset([
+        'admonition', 'attention', 'caution', 'centered', 'compound',
+        'container', 'danger', 'deprecated', 'epigraph', 'error', 'glossary',
+        'highlights', 'hint', 'important', 'note', 'only', 'pull-quote',
+        'rst-class', 'seealso', 'sidebar', 'tip', 'todo', 'topic',
+        'versionadded', 'versionchanged', 'warning',
+    ])
+    EXPLICIT_MARKUP = re.compile(r'\.\.(?:\s|$)')
+    DIRECTIVE = re.compile(r'\.\.\s+([\w.:+-]+?)\s?::(?:\s|$)')
+    # Blocks starting with these may be lists, fields, options, line blocks,
+    # doctest blocks or tables.
+    MARKUP_START = re.compile(
+        r'(?:[-*+•‣⁃|](?:\s|$)|>>>|[-+=:/]'
+        r'|\(?(?:\d+|#|[a-zA-Z]|[ivxlcdmIVXLCDM]+)[.)](?:\s|$))')
+    ADORNMENT = re.compile(r'([!-/:-@\[-`{-~])\1*(?:\s+\1+)*$')
+    TABLE_BORDER = re.compile(r'=+(?:\s+=+)*$')
+    # Doctest blocks and line blocks, which end with a blank line.
+    UNTIL_BLANK = re.compile(r'>>>|\|(?:\s|$)')
+    INLINE_DELIMITER = re.compile(r'(?<!\\)(?:`+|\|)')
+    START_PREFIX = punctuation_chars.openers + punctuation_chars.delimiters
+    END_SUFFIX = (punctuation_chars.closing_delimiters
+                  + punctuation_chars.delimiters + punctuation_chars.closers)
+    WORD_MARKUP = re.compile(r'[\\`|_\[\]<>@]')
+
+    # Modes of _SourceState: lines after a paragraph ending with '::', lines
+    # indented more than mode_indent, lines indented at least mode_indent until
+    # a blank line, and lines of a simple table (after a border line or not).
+    (MODE_LITERAL, MODE_SKIP, MODE_UNTIL_BLANK, MODE_TABLE,
+     MODE_BORDER) = range(5)
+
+    def __init__(self, trimmers):
+        self._trimmers = trimmers
+
+    def trim_source(self, source):
+        return ''.join(self.iter_lines(source.splitlines(True)))
+
+    def iter_lines(self, lines):
+        state = _SourceState()
+        for line in lines:
+            content = line.rstrip()
+            if not content:
+                if state.block:
+                    yield from self._trim_block(state.take_block(),
+                                                state.joinable)
+                self._end_at_blank(state)
+                yield line
+                continue
+            stripped = content.lstrip()
+            indent = len(content.expandtabs(8)) - len(
+                content.expandtabs(8).lstrip())
+            if state.block and indent != state.block_indent:
+                yield from self._trim_block(state.take_block(), False)
+            if self._pass_line(state, stripped, indent):
+                state.passed = True
+                yield line
+                continue
+            if not state.block:
+                state.joinable = not state.passed
+            state.passed = False
+            state.block.append(line)
+            state.block_indent = indent
+            if len(state.block) == 1 and self.MARKUP_START.match(stripped):
+                # The next line does not continue a list item, field, etc.
+                if not content.endswith('::') and self._starts_with_markup(
+                        stripped.split(None, 1)[1:]):
+                    # The body of the list item, field, etc. is not a
+                    # paragraph.
+                    state.set_mode(self.MODE_UNTIL_BLANK, indent + 1)
+                yield from self._trim_block(state.take_block(), False)
+        if state.block:
+            yield from self._trim_block(state.take_block(), state.joinable)
+
+    def _end_at_blank(self, state):
+        if state.mode == self.MODE_BORDER:
+            # A simple table ends with a border followed by a blank line.
+            state.set_mode(None)
+        elif state.mode == self.MODE_UNTIL_BLANK:
+            # Indented lines may continue explicit markup which looks as a
+            # part of the passed through lines.
+            state.mode = self.MODE_SKIP
+        state.passed = False
+
+    def _pass_line(self, state, stripped, indent):
+        # Tell whether the line is passed through as is.
+        if state.mode == self.MODE_LITERAL:
+            self._start_literal(state, indent)
+        if (state.mode in (self.MODE_SKIP, self.MODE_UNTIL_BLANK)
+                and self._pass_indented(state, indent)):
+            return True
+        if state.mode in (self.MODE_TABLE, self.MODE_BORDER):
+            return self._pass_table(state, stripped)
+        return not state.block and self._pass_markup(state, stripped, indent)
+
+    def _start_literal(self, state, indent):
+        # The first line after a paragraph ending with '::'.
+        if indent == state.mode_indent:
+            # Quoted literal block.
+            state.set_mode(self.MODE_UNTIL_BLANK, indent)
+        elif indent > state.mode_indent:
+            state.set_mode(self.MODE_SKIP, state.mode_indent)
+        else:
+            state.set_mode(None)
+
+    def _pass_indented(self, state, indent):
+        if (indent > state.mode_indent
+                or state.mode == self.MODE_UNTIL_BLANK
+                and indent == state.mode_indent):
+            return True
+        state.set_mode(None)
+        return False
+
+    def _pass_table(self, state, stripped):
+        if self.TABLE_BORDER.match(stripped):
+            state.set_mode(self.MODE_BORDER)
+        else:
+            state.set_mode(self.MODE_TABLE)
+        return True
+
+    def _pass_markup(self, state, stripped, indent):
+        # Explicit markup, tables, doctest blocks and line blocks which start
+        # at the line.
+        if self.EXPLICIT_MARKUP.match(stripped):
+            directive = self.DIRECTIVE.match(stripped)
+            if (directive is None
+                    or directive.group(1) not in self.BODY_DIRECTIVES):
+                state.set_mode(self.MODE_SKIP, indent)
+            return True
+        if self.TABLE_BORDER.match(stripped):
+            state.set_mode(self.MODE_BORDER)
+            return True
+        if self.UNTIL_BLANK.match(stripped):
+            state.set_mode(self.MODE_UNTIL_BLANK, indent)
+            return True
+        return False
+
+    def _starts_with_markup(self, txts):
+        return any(
+            pattern.match(txt) for txt in txts for pattern in (
+                self.EXPLICIT_MARKUP, self.TABLE_BORDER, self.UNTIL_BLANK,
+                self.MARKUP_START))
+
+    def _trim_block(self, block, joinable):
+        if (not joinable or len(block) == 1
+                or any(self.ADORNMENT.match(line.strip()) for line in block)):
+            yield from block
+            return
+        lines = []
+        num_joined = 0
+        opened = ''
+        for line in block:
+            txt = line.strip()
+            # Breaks in inline markup which is not closed are kept.
+            if lines and opened == '' and self._is_removable(
+                    lines[-1].rstrip(), txt):
+                lines[-1] = lines[-1].rstrip() + txt + line[len(line.rstrip()):]
+                num_joined += 1
+            else:
+                lines.append(line)
+            if opened is not None:
+                opened = self._scan_inline(txt, opened)
+        yield from lines
+        newline = block[-1][len(block[-1].rstrip('\r\n')):] or '\n'
+        for _ in range(num_joined):
+            yield newline
+
+    def _scan_inline(self, txt, opened):
+        # Return the start-string of inline literal, interpreted text or
+        # substitution reference left open at the end of txt, or None if it
+        # cannot be told without parsing.
+        for match in self.INLINE_DELIMITER.finditer(txt):
+            start, end = match.span()
+            before = txt[start - 1] if start > 0 else ' '
+            rest = txt[end:]
+            if not opened:
+                if (not (before.isspace() or before in self.START_PREFIX)
+                        or not rest or rest[0].isspace()):
+                    return None
+                opened = match.group()
+                continue
+            # The end-string may be followed by '_' or '__' of a reference.
+            suffix = rest.lstrip('_')
+            after = suffix[:1] or ' '
+            if (match.group() != opened or before.isspace()
+                    or len(rest) - len(suffix) > 2
+                    or not (after.isspace() or after in self.END_SUFFIX)):
+                return None
+            opened = ''
+        return opened
+
+    def _is_removable(self, head, tail):
+        if not all(trimmer.char_ranges[head[-1]]
+                   and trimmer.char_ranges[tail[0]]
+                   for trimmer in self._trimmers):
+            return False
+        # Joined words may become a reference name, a citation reference or
+        # an email address.
+        if self.WORD_MARKUP.search(head.split()[-1] + tail.split()[0]):
+            return False
+        leading = head[-Trimmer.LEADING_CONTEXT:]
+        following = tail[:Trimmer.FOLLOWING_CONTEXT]
+        return all(
+            trimmer.trim_blank(leading + '\n' + following)
+            == leading + following for trimmer in self._trimmers)
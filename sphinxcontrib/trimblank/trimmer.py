@@ -0,0 +1,348 @@
+import bisect
+import collections
+import re
+import sys
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    try:
+        # Python < 3.11, where it is not deprecated yet.
+        import sre_parse  # pylint: disable=deprecated-module
+    except ImportError:
+        sre_parse = None
+
+class CharRanges(dict):
+    # Sorted and merged intervals of code points of CJK characters, given as
+    # pairs of code points or of one-character strings. Indexing with a
+    # character tells whether it is in the ranges; it is classified by a
+    # binary search once, then looked up in the dict.
+
+    def __init__(self, intervals):
+        super(CharRanges, self).__init__()
+        merged = []
+        for start, end in sorted(
+                CharRanges._parse(interval) for interval in intervals):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        self.intervals = tuple(merged)
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+        self._min_char = chr(merged[0][0]) if merged else None
+        # The same characters as a class of regular expressions.
+        self.regex_class = '[%s]' % ''.join(
+            r'\U%08X-\U%08X' % interval for interval in merged
+        ) if merged else r'[^\s\S]'
+
+    @staticmethod
+    def _parse(interval):
+        try:
+            start, end = (
+                ord(bound) if isinstance(bound, str) else bound
+                for bound in interval)
+        except (TypeError, ValueError):
+            start = end = None
+        if not (isinstance(start, int) and isinstance(end, int)
+                and 0 <= start <= end <= sys.maxunicode):
+            raise ValueError('%r is not an interval of code points'
+                             % (interval,))
+        return start, end
+
+    def __missing__(self, char):
+        code = ord(char)
+        idx = bisect.bisect_right(self._starts, code) - 1
+        result = self[char] = idx >= 0 and code <= self._ends[idx]
+        return result
+
+    def contains_any(self, txt):
+        if self._min_char is None or txt.isascii():
+            return False
+        min_char = self._min_char
+        for char in txt:
+            if char >= min_char and self[char]:
+                return True
+        return False
+
+    def ends_with(self, txt, blank=False):
+        # Same as re.search(r'<CJK>$', txt), or r'<CJK>\s$' with blank. '$'
+        # also matches before a trailing newline.
+        num_chars = 2 if blank else 1
+        if len(txt) >= num_chars and self[txt[-num_chars]] and (
+                not blank or txt[-1].isspace()):
+            return True
+        return (txt[-1:] == '\n' and len(txt) > num_chars
+                and self[txt[-num_chars - 1]]
+                and (not blank or txt[-2].isspace()))
+
+
+class Trimmer(object):
+    # Default intervals of trimblank_char_ranges.
+    CJK_INTERVALS = (
+        (0x2E80, 0x9FFF),
+        (0xF900, 0xFAFF),   # CJK Compatibility Ideographs
+        (0xFF00, 0xFF60), (0xFFE0, 0xFFE6), # Halfwidth and Fullwidth Forms
+        (0x20000, 0x3FFFF), # Supplementary, Tertiary Ideographic Plane
+    )
+    # Number of characters of the leading/following text which trim_head and
+    # trim_tail look at ('$' also matches before a trailing newline).
+    LEADING_CONTEXT = 2
+    FOLLOWING_CONTEXT = 1
+
+    # Candidates of a character to join texts in trim_blanks. They are
+    # noncharacters, so never appear in documents.
+    SEPARATORS = ('\uFFFF', '\uFFFE', '\U0010FFFF')
+
+    # Texts longer than this are trimmed chunk by chunk, so that the pieces
+    # kept at once stay bounded however large a text node is.
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, keep_alnum_blank, keep_blank_before, keep_blank_after,
+                 char_ranges=None):
+        self.char_ranges = to_char_ranges(char_ranges)
+        cjk = self.char_ranges.regex_class
+        if keep_alnum_blank:
+            pattern = r'(?<=%s)\s(?=%s)' % (cjk, cjk)
+            self._condition = all
+        else:
+            pattern = (r'(?<=%s)\s(?!%s)|(?<!%s)\s(?=%s)'
+                       % (cjk, keep_blank_before, keep_blank_after, cjk))
+            self._condition = any
+        self._pattern = re.compile(pattern)
+        # The patterns are grouped, so that alternatives in them are anchored
+        # as a whole.
+        self._head_exlusion_pattern = re.compile(
+            r'^\s(?:%s)' % keep_blank_before)
+        # Same as r'(?:<after>)\s$', which trim_tail looks for only where a
+        # match can start: within the maximum width of the match from the end
+        # (or anywhere if the width is unknown).
+        self._tail_exlusion_pattern = re.compile(
+            r'(?:%s)\s\n?\Z' % keep_blank_after)
+        width = _get_width(keep_blank_after)
+        self._tail_exlusion_width = (
+            sys.maxsize if width is None else width[1] + 2)
+        self._separator = Trimmer._find_separator(
+            self.char_ranges, keep_alnum_blank, keep_blank_before,
+            keep_blank_after)
+
+    @staticmethod
+    def _find_separator(char_ranges, keep_alnum_blank, keep_blank_before,
+                        keep_blank_after):
+        # A separator must look like the end/start of a text to the
+        # lookarounds of the blank pattern, so it must not be a CJK character.
+        separators = [separator for separator in Trimmer.SEPARATORS
+                      if not char_ranges[separator]]
+        if keep_alnum_blank:
+            return separators[0] if separators else None
+        # Otherwise the separator must also not match keep_blank_before/after,
+        # which tells how they see the end/start of a text only if they match
+        # exactly one character (r'$' or r'\Wあ' see beyond it).
+        if (_get_width(keep_blank_before) != (1, 1)
+                or _get_width(keep_blank_after) != (1, 1)):
+            return None
+        before = re.compile(keep_blank_before)
+        after = re.compile(r'(?:%s)\Z' % keep_blank_after)
+        for separator in separators:
+            if not before.match(separator) and not after.search(separator):
+                return separator
+        return None
+
+    def trim_blank(self, target_txt):
+        if len(target_txt) <= Trimmer.CHUNK_SIZE:
+            return self._pattern.sub('', target_txt)
+        # Every match is a single blank, and the lookarounds see the
+        # characters around a chunk as they see the whole text.
+        return _remove_chars(target_txt, (
+            match.start() for match in self._pattern.finditer(target_txt)))
+
+    def trim_blanks(self, target_txts):
+        # Same as [self.trim_blank(txt) for txt in target_txts], but scans all
+        # texts at once.
+        separator = self._separator
+        joined = separator.join(target_txts) if separator else None
+        if joined is None or joined.count(separator) != len(target_txts) - 1:
+            return [self.trim_blank(txt) for txt in target_txts]
+        return self.trim_blank(joined).split(separator)
+
+    def trim_head(self, target_txt, leading_txt):
+        if self._head_exlusion_pattern.match(target_txt):
+            return target_txt
+        if not self._condition((
+                self.char_ranges.ends_with(leading_txt),
+                len(target_txt) >= 2 and target_txt[0].isspace()
+                and self.char_ranges[target_txt[1]])):
+            return target_txt
+        return target_txt.lstrip()
+
+    def trim_tail(self, target_txt, following_txt):
+        if self._tail_exlusion_pattern.search(target_txt, max(
+                len(target_txt) - self._tail_exlusion_width, 0)):
+            return target_txt
+        if not self._condition((
+                self.char_ranges.ends_with(target_txt, blank=True),
+                following_txt[:1] and self.char_ranges[following_txt[0]])):
+            return target_txt
+        return target_txt.rstrip()
+
+
+def _remove_chars(txt, indices):
+    # Return txt without the characters at the ascending indices. Pieces are
+    # joined per chunk of Trimmer.CHUNK_SIZE characters to bound their number.
+    chunk_size = Trimmer.CHUNK_SIZE
+    chunks = []
+    pieces = []
+    start = 0
+    chunk_end = chunk_size
+    for idx in indices:
+        while idx >= chunk_end:
+            pieces.append(txt[start:chunk_end])
+            chunks.append(''.join(pieces))
+            pieces = []
+            start = chunk_end
+            chunk_end += chunk_size
+        pieces.append(txt[start:idx])
+        start = idx + 1
+    if start == 0:
+        return txt
+    while start < len(txt):
+        pieces.append(txt[start:chunk_end])
+        chunks.append(''.join(pieces))
+        pieces = []
+        start = chunk_end
+        chunk_end += chunk_size
+    chunks.append(''.join(pieces))
+    return ''.join(chunks)
+
+def _get_width(pattern):
+    # (min, max) widths of the matches of pattern, or None if they cannot be
+    # told: the parser of re is not a public API.
+    if sre_parse is None:
+        return None
+    try:
+        return tuple(sre_parse.parse(pattern).getwidth())
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+CJK_RANGES = CharRanges(Trimmer.CJK_INTERVALS)
+
+def to_char_ranges(char_ranges):
+    if char_ranges is None:
+        return CJK_RANGES
+    if isinstance(char_ranges, CharRanges):
+        return char_ranges
+    return CharRanges(char_ranges)
+
+def is_cjk_char(char, char_ranges=None):
+    return to_char_ranges(char_ranges)[char]
+
+def contains_cjk(txt, char_ranges=None):
+    return to_char_ranges(char_ranges).contains_any(txt)
+
+class CachingTrimmer(object):
+    # Wrap a trimmer with a bounded LRU cache of its results, keyed by the
+    # method, the target text and the leading/following text. Target texts
+    # longer than Trimmer.CHUNK_SIZE are not cached, so that the cache does
+    # not keep large texts alive.
+
+    def __init__(self, trimmer, maxsize):
+        self._trimmer = trimmer
+        self._maxsize = maxsize
+        self.char_ranges = trimmer.char_ranges
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def trim_blank(self, target_txt):
+        key = (0, target_txt)
+        result = self._get(key)
+        if result is None:
+            result = self._put(key, self._trimmer.trim_blank(target_txt))
+        return result
+
+    def trim_blanks(self, target_txts):
+        results = [self._get((0, txt)) for txt in target_txts]
+        missed = [idx for idx, result in enumerate(results) if result is None]
+        if missed:
+            trimmed = self._trimmer.trim_blanks(
+                [target_txts[idx] for idx in missed])
+            for idx, result in zip(missed, trimmed):
+                results[idx] = self._put((0, target_txts[idx]), result)
+        return results
+
+    def trim_head(self, target_txt, leading_txt):
+        key = (1, target_txt, leading_txt)
+        result = self._get(key)
+        if result is None:
+            result = self._put(
+                key, self._trimmer.trim_head(target_txt, leading_txt))
+        return result
+
+    def trim_tail(self, target_txt, following_txt):
+        key = (2, target_txt, following_txt)
+        result = self._get(key)
+        if result is None:
+            result = self._put(
+                key, self._trimmer.trim_tail(target_txt, following_txt))
+        return result
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._cache), 'maxsize': self._maxsize}
+
+    def _get(self, key):
+        if len(key[1]) > Trimmer.CHUNK_SIZE:
+            self.misses += 1
+            return None
+        result = self._cache.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self._cache.move_to_end(key)
+            self.hits += 1
+        return result
+
+    def _put(self, key, result):
+        if len(key[1]) > Trimmer.CHUNK_SIZE:
+            return result
+        self._cache[key] = result
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return result
+
+
+DEFAULT_KEEP_BLANK_BEFORE = r'[\s(]'
+DEFAULT_KEEP_BLANK_AFTER = r'[\s),.:?]'
+
+# Trimmers shared by all documents (and forked worker processes) of a build,
+# keyed by their constructor arguments.
+_TRIMMERS = {}
+
+# CharRanges of trimblank_char_ranges and of trim_many, keyed by the
+# intervals.
+_CHAR_RANGES = {}
+
+def get_shared_char_ranges(intervals):
+    if intervals is None or isinstance(intervals, CharRanges):
+        return to_char_ranges(intervals)
+    try:
+        intervals = tuple(tuple(interval) for interval in intervals)
+    except TypeError as exc:
+        raise ValueError(
+            '%r is not a list of intervals' % (intervals,)) from exc
+    char_ranges = _CHAR_RANGES.get(intervals)
+    if char_ranges is None:
+        char_ranges = _CHAR_RANGES[intervals] = CharRanges(intervals)
+    return char_ranges
+
+def get_shared_trimmer(cache_size, char_ranges, keep_alnum_blank,
+                       keep_blank_before, keep_blank_after):
+    options = (keep_alnum_blank, keep_blank_before, keep_blank_after)
+    char_ranges = get_shared_char_ranges(char_ranges)
+    trimmer_key = (cache_size, char_ranges.intervals) + options
+    trimmer = _TRIMMERS.get(trimmer_key)
+    if trimmer is None:
+        trimmer = Trimmer(*options, char_ranges=char_ranges)
+        if cache_size > 0:
+            trimmer = CachingTrimmer(trimmer, cache_size)
+        _TRIMMERS[trimmer_key] = trimmer
+    return trimmer
@@ -0,0 +1,497 @@
+from docutils import nodes
+from .trimmer import CJK_RANGES, Trimmer, to_char_ranges
+
+def has_cjk_text(node, char_ranges=None):
+    # Every trimming decision needs a CJK character in the text of the element
+    # or of its children, so an element without one is left as it is.
+    char_ranges = to_char_ranges(char_ranges)
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, nodes.Text):
+            if char_ranges.contains_any(node):
+                return True
+        elif type(node).astext is not nodes.Element.astext:
+            if char_ranges.contains_any(node.astext()):
+                return True
+        else:
+            stack.extend(node.children)
+    return False
+
+
+class TrimblankVisitor(nodes.GenericNodeVisitor):
+    EXCLUDED_ELEMENTS = (
+        nodes.FixedTextElement, nodes.Inline,
+        nodes.Invisible, nodes.Bibliographic)
+    TARGET_INLINE_ELEMENTS = (nodes.emphasis, nodes.strong)
+    # Actions of traverse() for each node class.
+    DESCEND, TRIM, SKIP, PRUNE = range(4)
+
+    def __init__(self, document, trimmer, logger=None, batch=False):
+        super(TrimblankVisitor, self).__init__(document)
+        self._trimmer = trimmer
+        self._logger = logger
+        self._batch = batch
+        self._actions = {}
+        self.num_visited = 0
+        self.num_trimmed = 0
+        self.num_skipped = 0
+        self.num_changed = 0
+        self.num_removed = 0
+        self.num_pruned = 0
+        # Subtrees of nodes of these classes, or with these values in their
+        # classes attribute, are not trimmed.
+        self.skip_nodes = ()
+        self.skip_classes = frozenset()
+        # A list to which (line, old text, new text) of changed texts are
+        # appended, up to max_samples.
+        self.samples = None
+        self.max_samples = 0
+
+    @staticmethod
+    def is_target(node):
+        if not isinstance(node, nodes.TextElement):
+            return False
+        return not isinstance(node, TrimblankVisitor.EXCLUDED_ELEMENTS)
+
+    def traverse(self, root):
+        # Same as root.walk(self), but iterates only over nodes which may
+        # contain targets, without dispatching a method on each node.
+        actions = self._actions
+        skip_classes = self.skip_classes
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.num_visited += 1
+            node_cls = type(node)
+            action = actions.get(node_cls)
+            if action is None:
+                action = actions[node_cls] = self._get_action(node_cls)
+            if action == TrimblankVisitor.SKIP:
+                continue
+            if action == TrimblankVisitor.PRUNE or (
+                    skip_classes
+                    and not skip_classes.isdisjoint(node['classes'])):
+                self.num_pruned += 1
+            elif action == TrimblankVisitor.DESCEND:
+                stack.extend(reversed(node.children))
+            else:
+                self.visit_target(node)
+
+    def iter_targets(self, root, root_classes=()):
+        # Same traversal as traverse(), but yields (root, path, target) for
+        # each target instead of visiting it, where path is the tuple of child
+        # indices from root to target. Nodes of root_classes start new roots.
+        # Sphinx removes system messages below the report level after they
+        # are read, so they are neither visited nor counted in paths.
+        actions = self._actions
+        skip_classes = self.skip_classes
+        stack = [(root, root, ())]
+        while stack:
+            node, node_root, path = stack.pop()
+            self.num_visited += 1
+            node_cls = type(node)
+            action = actions.get(node_cls)
+            if action is None:
+                action = actions[node_cls] = self._get_action(node_cls)
+            if action == TrimblankVisitor.SKIP:
+                continue
+            if action == TrimblankVisitor.PRUNE or (
+                    skip_classes
+                    and not skip_classes.isdisjoint(node['classes'])):
+                self.num_pruned += 1
+            elif action == TrimblankVisitor.DESCEND:
+                if isinstance(node, root_classes):
+                    node_root, path = node, ()
+                children = [child for child in node.children
+                            if not isinstance(child, nodes.system_message)]
+                stack.extend(
+                    (children[idx], node_root, path + (idx,))
+                    for idx in range(len(children) - 1, -1, -1))
+            else:
+                yield node_root, path, node
+
+    def _get_action(self, node_cls):
+        if issubclass(node_cls, nodes.Text):
+            return TrimblankVisitor.SKIP
+        if self.skip_nodes and issubclass(node_cls, self.skip_nodes):
+            return TrimblankVisitor.PRUNE
+        if (issubclass(node_cls, nodes.TextElement) and
+                not issubclass(node_cls, TrimblankVisitor.EXCLUDED_ELEMENTS)):
+            return TrimblankVisitor.TRIM
+        return TrimblankVisitor.DESCEND
+
+    def default_visit(self, node):
+        self.num_visited += 1
+        if self.is_pruned(node):
+            self.num_pruned += 1
+            raise nodes.SkipChildren
+        if not TrimblankVisitor.is_target(node):
+            return
+        self.visit_target(node)
+        raise nodes.SkipChildren
+
+    def is_pruned(self, node):
+        if isinstance(node, self.skip_nodes):
+            return True
+        return (isinstance(node, nodes.Element) and
+                not self.skip_classes.isdisjoint(node['classes']))
+
+    def visit_target(self, node):
+        if not has_cjk_text(node, self._trimmer.char_ranges):
+            self.num_skipped += 1
+            return
+        self.num_trimmed += 1
+        self.trim_element(node)
+
+    def default_departure(self, _node):
+        assert False, 'Never use depature method'
+
+    def unknown_visit(self, node):
+        self.default_visit(node)
+
+    def trim_element(self, node):
+        if not self._batch:
+            self._trim_children(node, None)
+            return
+        # Trim blanks inside all texts of the paragraph with one scan, then
+        # trim only boundaries which start/end with a blank.
+        old_txts = [get_text(child) for _, child in iter_texts(node)]
+        new_txts = self._trimmer.trim_blanks(old_txts)
+        self._trim_children(node, zip(old_txts, new_txts))
+
+    def _trim_children(self, root, blanked_txts):
+        # Nested emphasis/strong elements are trimmed with an explicit stack
+        # of (element, index of the next child, new children, changed).
+        stack = [(root, 0, [], False)]
+        while stack:
+            node, idx, new_children, changed = stack.pop()
+            children = node.children
+            num_children = len(children)
+            while idx < num_children:
+                child = children[idx]
+                idx += 1
+                if not isinstance(child, nodes.Text):
+                    new_children.append(child)
+                    if isinstance(
+                            child, TrimblankVisitor.TARGET_INLINE_ELEMENTS):
+                        stack.append((node, idx, new_children, changed))
+                        stack.append((child, 0, [], False))
+                        break
+                    continue
+                if blanked_txts is None:
+                    old_txt = get_text(child)
+                    new_txt = self._trimmer.trim_blank(old_txt)
+                    has_head_blank = has_tail_blank = True
+                else:
+                    old_txt, new_txt = next(blanked_txts)
+                    has_head_blank = new_txt[:1].isspace()
+                    has_tail_blank = new_txt[-1:].isspace()
+                if idx - 2 >= 0 and has_head_blank:
+                    prev_txt = get_tail_chars(
+                        new_children[-1], Trimmer.LEADING_CONTEXT)
+                    new_txt = self._trimmer.trim_head(new_txt, prev_txt)
+                if idx < num_children and has_tail_blank:
+                    next_txt = get_head_chars(
+                        children[idx], Trimmer.FOLLOWING_CONTEXT)
+                    new_txt = self._trimmer.trim_tail(new_txt, next_txt)
+
+                new_child = self._update_text(node, child, old_txt, new_txt)
+                changed = changed or new_child is not child
+                new_children.append(new_child)
+            else:
+                if changed:
+                    children[:] = new_children
+
+    def _update_text(self, node, child, old_txt, new_txt):
+        if old_txt != new_txt:
+            self.num_changed += 1
+            self.num_removed += len(old_txt) - len(new_txt)
+            if self.samples is not None and (
+                    len(self.samples) < self.max_samples):
+                self.samples.append((node.line, old_txt, new_txt))
+            if self._logger is not None:
+                self._logger.info(
+                    '\nBefore : %s\nAfter  : %s',
+                    old_txt, new_txt, location=child)
+        if new_txt == child:
+            return child
+        new_child = nodes.Text(new_txt)
+        node.setup_child(new_child)
+        return new_child
+
+
+class ReadTrimblankVisitor(TrimblankVisitor):
+    # Trim a doctree when it is read, and record for each target the shape
+    # it is left with, and the texts which each of the other trimmers would
+    # give it (where they differ). Targets with references which are not
+    # resolved yet are neither trimmed nor recorded. The trimmer may be None
+    # to record without trimming.
+
+    def __init__(self, document, trimmer, logger=None, batch=False):
+        super(ReadTrimblankVisitor, self).__init__(
+            document, trimmer, logger, batch)
+        # Visitors of the other trimmers (or None for the untrimmed texts)
+        # keyed by their trimmer keys.
+        self.others = {}
+        self.char_ranges = CJK_RANGES
+        # Class of nodes of unresolved references.
+        self.unresolved = None
+        self.shapes = {}
+        self.texts = {}
+
+    def trim_and_record(self, root):
+        for key in self.others:
+            self.texts.setdefault(key, {})
+        for _, path, node in self.iter_targets(root):
+            if (self.unresolved is not None
+                    and node.next_node(self.unresolved) is not None):
+                continue
+            if not has_cjk_text(node, self.char_ranges):
+                self.num_skipped += 1
+            else:
+                self.num_trimmed += 1
+                variants = [(key, get_trimmed_texts(node, other))
+                            for key, other in self.others.items()]
+                if self._trimmer is not None:
+                    self.trim_element(node)
+                texts = get_texts(node)
+                for key, variant in variants:
+                    if variant != texts:
+                        self.texts[key][path] = variant
+            self.shapes[path] = get_shape(node)
+
+
+class ResolvedTrimblankVisitor(TrimblankVisitor):
+    # Finish trimming a resolved doctree of documents trimmed when they were
+    # read. A target matched to its record which still has the recorded shape
+    # is left as it is, or gets the texts recorded for the key of the trimmer;
+    # a matched target changed after reading gets its untrimmed texts back,
+    # and is trimmed with the others (those with resolved references, and
+    # those added after reading). The trimmer may be None to only restore
+    # untrimmed texts.
+
+    def __init__(self, document, trimmer, logger=None, batch=False):
+        super(ResolvedTrimblankVisitor, self).__init__(
+            document, trimmer, logger, batch)
+        self.key = None
+        # (target, record, path) of matched targets keyed by their ids, as
+        # made by match_read_targets.
+        self.matched = {}
+        self.num_reused = 0
+
+    def visit_target(self, node):
+        matched = self.matched.get(id(node))
+        if matched is not None and matched[0] is node:
+            record, path = matched[1:]
+            shape = get_shape(node)
+            if shape != record['shapes'][path]:
+                self._restore_texts(node, record, path, shape)
+            elif record['key'] == self.key:
+                self.num_reused += 1
+                return
+            else:
+                texts = record['texts'].get(self.key, {}).get(path, ())
+                if self.key in record['texts'] and (
+                        not texts or len(texts) == shape[2]):
+                    self.num_reused += 1
+                    if texts:
+                        self._apply_texts(node, iter(texts))
+                    return
+        if self._trimmer is not None:
+            super(ResolvedTrimblankVisitor, self).visit_target(node)
+
+    def restore_unvisited(self, root):
+        # Restore the untrimmed texts of matched targets which traverse(root)
+        # does not visit, e.g. footnotes moved into paragraphs, since they are
+        # left untrimmed without trimming at read.
+        for node, record, path in self.matched.values():
+            parent = node.parent
+            while parent is not None and parent is not root:
+                action = self._actions.get(type(parent))
+                if action is None:
+                    action = self._actions[type(parent)] = self._get_action(
+                        type(parent))
+                if action != TrimblankVisitor.DESCEND or (
+                        self.skip_classes
+                        and not self.skip_classes.isdisjoint(
+                            parent['classes'])):
+                    self._restore_texts(node, record, path, get_shape(node))
+                    break
+                parent = parent.parent
+
+    def _restore_texts(self, node, record, path, shape):
+        # The untrimmed texts are given back only if the texts trimmed at read
+        # are still there (the same number of texts with the same length).
+        texts = record['texts'].get(None, {}).get(path)
+        if texts and shape[2:4] == record['shapes'][path][2:4]:
+            self._apply_texts(node, iter(texts))
+
+    def _apply_texts(self, root, new_texts):
+        stack = [(root, 0, [], False)]
+        while stack:
+            node, idx, new_children, changed = stack.pop()
+            children = node.children
+            num_children = len(children)
+            while idx < num_children:
+                child = children[idx]
+                idx += 1
+                if isinstance(child, nodes.Text):
+                    new_child = self._update_text(
+                        node, child, child.astext(), next(new_texts))
+                    changed = changed or new_child is not child
+                    child = new_child
+                elif isinstance(
+                        child, TrimblankVisitor.TARGET_INLINE_ELEMENTS):
+                    new_children.append(child)
+                    stack.append((node, idx, new_children, changed))
+                    stack.append((child, 0, [], False))
+                    break
+                new_children.append(child)
+            else:
+                if changed:
+                    children[:] = new_children
+
+
+def _iter_inline_children(node):
+    # Yield the children of node, descending into target inline elements
+    # between markers None (enter) and False (leave).
+    stack = [iter(list(node.children))]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            if stack:
+                yield False
+            continue
+        yield child
+        if isinstance(child, TrimblankVisitor.TARGET_INLINE_ELEMENTS):
+            yield None
+            stack.append(iter(list(child.children)))
+
+def iter_texts(node):
+    # Yield (parent, Text) pairs in the same order as trim_element visits them.
+    parents = [node]
+    last_child = node
+    for child in _iter_inline_children(node):
+        if child is None:
+            parents.append(last_child)
+        elif child is False:
+            parents.pop()
+        else:
+            if isinstance(child, nodes.Text):
+                yield parents[-1], child
+            last_child = child
+
+def findall(node, condition=None):
+    # Node.findall() of docutils 0.18 and later, which deprecates traverse().
+    if hasattr(node, 'findall'):
+        return node.findall(condition)
+    return iter(node.traverse(condition))
+
+def get_text(child):
+    # Same as child.astext(), but without copying a text without escapes.
+    return child.astext() if '\x00' in child else child
+
+def _get_text_edge(txt, count, from_tail):
+    # Unescaping never removes characters other than NUL, space and newline,
+    # and never removes a sequence across any other character. So it is
+    # enough to unescape the part up to the count-th such character.
+    indices = range(len(txt) - 1, -1, -1) if from_tail else range(len(txt))
+    found = 0
+    for idx in indices:
+        if txt[idx] not in '\x00 \n':
+            found += 1
+            if found == count:
+                txt = txt[idx:] if from_tail else txt[:idx + 1]
+                break
+    if '\x00' in txt:
+        txt = nodes.unescape(txt)
+    return txt[-count:] if from_tail else txt[:count]
+
+def _iter_edge_parts(node, from_tail):
+    # Yield the parts of node.astext() (Text nodes and other strings) from its
+    # head or tail.
+    stack = [iter((node,))]
+    while stack:
+        part = next(stack[-1], None)
+        if part is None:
+            stack.pop()
+        elif type(part) is str or isinstance(part, nodes.Text):
+            yield part
+        elif type(part).astext is not nodes.Element.astext:
+            yield part.astext()
+        else:
+            stack.append(_iter_joined(
+                part.children, part.child_text_separator, from_tail))
+
+def _iter_joined(children, separator, from_tail):
+    indices = (range(len(children) - 1, -1, -1) if from_tail
+               else range(len(children)))
+    for num, idx in enumerate(indices):
+        if num > 0 and separator:
+            yield separator
+        yield children[idx]
+
+def _get_edge(node, count, from_tail):
+    if isinstance(node, nodes.Text):
+        return _get_text_edge(node, count, from_tail)
+    if (len(node.children) == 1 and isinstance(node.children[0], nodes.Text)
+            and type(node).astext is nodes.Element.astext):
+        return _get_text_edge(node.children[0], count, from_tail)
+    edge = ''
+    for part in _iter_edge_parts(node, from_tail):
+        if isinstance(part, nodes.Text):
+            part = _get_text_edge(part, count - len(edge), from_tail)
+        edge = part + edge if from_tail else edge + part
+        if len(edge) >= count:
+            break
+    return edge[-count:] if from_tail else edge[:count]
+
+def get_head_chars(node, count=1):
+    # Same as node.astext()[:count] without serializing the whole node.
+    return _get_edge(node, count, False)
+
+def get_tail_chars(node, count=1):
+    # Same as node.astext()[-count:] without serializing the whole node.
+    return _get_edge(node, count, True)
+
+def get_texts(node):
+    # Copies of the texts as str: a Text node keeps its parent, so recording
+    # it would record the whole doctree with it.
+    return tuple(str(get_text(child)) for _, child in iter_texts(node))
+
+def get_trimmed_texts(node, visitor):
+    # Texts of node as trim_element of visitor (or None for untrimmed texts)
+    # gives them, leaving node as it is.
+    if visitor is None:
+        return get_texts(node)
+    elements = [node] + [
+        child for child in _iter_inline_children(node)
+        if isinstance(child, TrimblankVisitor.TARGET_INLINE_ELEMENTS)]
+    children = [list(element.children) for element in elements]
+    visitor.trim_element(node)
+    texts = get_texts(node)
+    for element, element_children in zip(elements, children):
+        element.children[:] = element_children
+    return texts
+
+def get_shape(node):
+    # Enough to tell a target from the other targets which may take its
+    # position, and whether its children were changed, without looking into
+    # its texts: the class and line of the target, the number and total length
+    # of its texts, and the paths and classes of all its descendants.
+    num_texts = length = 0
+    for _, child in iter_texts(node):
+        num_texts += 1
+        length += len(child)
+    descendants = []
+    stack = [((), node)]
+    while stack:
+        path, parent = stack.pop()
+        for idx, child in enumerate(parent.children):
+            descendants.append((path + (idx,), type(child).__name__))
+            if not isinstance(child, nodes.Text):
+                stack.append((path + (idx,), child))
+    return (type(node).__name__, node.line, num_texts, length,
+            tuple(descendants))
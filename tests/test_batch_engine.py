@@ -0,0 +1,94 @@
+import random
+import unittest
+from unittest.mock import Mock
+from docutils import nodes
+from sphinxcontrib.trimblank import Trimmer, TrimblankVisitor
+
+CHARS = ['あ', '漢', 'Ａ', 'a', '1', ' ', '  ', '\n', '\t', '(', ')', ',', '.', ':']
+INLINE_ELEMS = (
+    nodes.strong, nodes.emphasis, nodes.literal, nodes.reference,
+    nodes.footnote_reference)
+TRIMMER_ARGS = [
+    (False, r'[\s(]', r'[\s),.:?]'),
+    (True, r'[\s(]', r'[\s),.:?]'),
+    (False, r'[:\s]', r'[,.\s]'),
+    (False, r'[^あ]', r'.'),
+    (False, r'[\s(]|$', r'[\s),.:?]'),
+    (False, r'\Wあ', r'[\s),.:?]'),
+    (False, r'[\s(]', r'\Wあ'),
+]
+
+def make_text(rand):
+    return ''.join(rand.choice(CHARS) for _ in range(rand.randint(0, 8)))
+
+def make_children(rand, depth):
+    children = []
+    for _ in range(rand.randint(0, 6)):
+        if depth < 3 and rand.random() < 0.3:
+            elem = rand.choice(INLINE_ELEMS)()
+            elem.extend(make_children(rand, depth + 1))
+            children.append(elem)
+        else:
+            children.append(nodes.Text(make_text(rand)))
+    return children
+
+def make_corpus(seed, size):
+    rand = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        corpus.append(make_children(rand, 0))
+    return corpus
+
+def trim(children, trimmer, batch):
+    doctree = nodes.document(Mock(), Mock())
+    doctree += nodes.paragraph('', '', *[child.deepcopy() for child in children])
+    doctree.walk(TrimblankVisitor(doctree, trimmer, batch=batch))
+    return doctree.pformat()
+
+class BatchEngineTest(unittest.TestCase):
+    def test_trim_blanks(self):
+        rand = random.Random(0)
+        for args in TRIMMER_ARGS:
+            trimmer = Trimmer(*args)
+            for _ in range(500):
+                txts = [make_text(rand) for _ in range(rand.randint(0, 6))]
+                with self.subTest(args=args, txts=txts):
+                    self.assertEqual(
+                        trimmer.trim_blanks(txts),
+                        [trimmer.trim_blank(txt) for txt in txts])
+
+    def test_trim_blanks_with_separator_in_text(self):
+        trimmer = Trimmer(False, r'[\s(]', r'[\s),.:?]')
+        txts = ['あ ￿ い', 'う え']
+
+        self.assertEqual(trimmer.trim_blanks(txts), ['あ￿い', 'うえ'])
+
+    def test_trim_blanks_without_separator(self):
+        trimmer = Trimmer(False, r'[\s\S]', r'[\s\S]')
+        txts = ['あ ', ' う', 'え (お']
+
+        self.assertEqual(trimmer.trim_blanks(txts), ['あ', 'う', 'え (お'])
+
+    def test_trim_blanks_with_separators_in_char_ranges(self):
+        txts = ['あ ', ' い', 'a ', ' b']
+        for char_ranges in ([(0x3000, 0x9FFF), (0xFF00, 0xFFFF),
+                             (0x20000, 0x10FFFF)],
+                            [(0x3000, 0x9FFF), (0xFFFE, 0xFFFF),
+                             (0x10FFFF, 0x10FFFF)]):
+            for keep_alnum_blank in (False, True):
+                trimmer = Trimmer(keep_alnum_blank, r'[\s(]', r'[\s),.:?]',
+                                  char_ranges)
+                with self.subTest(char_ranges=char_ranges,
+                                  keep_alnum_blank=keep_alnum_blank):
+                    self.assertEqual(
+                        trimmer.trim_blanks(txts),
+                        [trimmer.trim_blank(txt) for txt in txts])
+
+    def test_visitor_engines_are_same(self):
+        corpus = make_corpus(1, 300)
+        for args in TRIMMER_ARGS:
+            trimmer = Trimmer(*args)
+            for children in corpus:
+                with self.subTest(args=args, children=children):
+                    self.assertEqual(trim(children, trimmer, True),
+                                     trim(children, trimmer, False))
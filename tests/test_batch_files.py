@@ -0,0 +1,199 @@
+import contextlib
+import io
+import os
+import pickle
+import re
+import tempfile
+import unittest
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinxcontrib.trimblank import (
+    Trimmer, iter_trim_files, main, trim_file, trim_files)
+
+def make_doctree():
+    doctree = nodes.document(None, None)
+    doctree.extend([
+        nodes.paragraph(
+            '', '', nodes.Text('あなたは '), nodes.strong(text='私を'),
+            nodes.Text(' 食べる')),
+        nodes.literal_block(text='あなたは 私を'),
+    ])
+    return doctree
+
+class BatchFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmpdir.name, 'source')
+        os.makedirs(os.path.join(self.source_dir, 'sub'))
+        self.write('a.txt', 'あなたは 私を\n食べる\r\nYou eat me\n')
+        self.write('b.txt', '変更 (なし)\n')
+        self.write('ignored.rst', 'あなたは 私を\n')
+        with open(os.path.join(self.source_dir, 'sub', 'c.doctree'),
+                  'wb') as output:
+            pickle.dump(make_doctree(), output, pickle.HIGHEST_PROTOCOL)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, txt):
+        with open(os.path.join(self.source_dir, name), 'w', encoding='utf-8',
+                  newline='') as output:
+            output.write(txt)
+
+    def read(self, directory, name):
+        with open(os.path.join(directory, name), encoding='utf-8',
+                  newline='') as source_file:
+            return source_file.read()
+
+    def check_output(self, output_dir):
+        self.assertEqual(self.read(output_dir, 'a.txt'),
+                         'あなたは私を\n食べる\r\nYou eat me\n')
+        self.assertEqual(self.read(output_dir, 'b.txt'), '変更 (なし)\n')
+        with open(os.path.join(output_dir, 'sub', 'c.doctree'),
+                  'rb') as source_file:
+            doctree = pickle.load(source_file)
+        self.assertEqual(
+            [child.astext() for child in doctree[0].children],
+            ['あなたは', '私を', '食べる'])
+        self.assertEqual(doctree[1].astext(), 'あなたは 私を')
+
+    def test_trim_files_with_workers(self):
+        output_dir = os.path.join(self.tmpdir.name, 'output')
+
+        stats = trim_files(self.source_dir, output_dir, workers=2, chunksize=1)
+
+        self.check_output(output_dir)
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'ignored.rst')))
+        self.assertEqual(stats['files'], 3)
+        self.assertEqual(stats['changed'], 2)
+        self.assertEqual((stats['failed'], stats['errors']), (0, []))
+        self.assertEqual(self.read(self.source_dir, 'a.txt'),
+                         'あなたは 私を\n食べる\r\nYou eat me\n')
+
+    def test_trim_files_in_place(self):
+        results = list(iter_trim_files(self.source_dir, workers=1))
+
+        self.check_output(self.source_dir)
+        self.assertEqual(
+            [(name, changed, error) for name, _, changed, error in results],
+            [('a.txt', True, None), ('b.txt', False, None),
+             (os.path.join('sub', 'c.doctree'), True, None)])
+
+    def test_broken_files_do_not_stop_others(self):
+        with open(os.path.join(self.source_dir, 'a0.txt'), 'wb') as output:
+            output.write(b'\xff\xfe')
+        with open(os.path.join(self.source_dir, 'sub', 'b.doctree'),
+                  'wb') as output:
+            output.write(b'broken')
+        output_dir = os.path.join(self.tmpdir.name, 'output')
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                stats = trim_files(self.source_dir, output_dir,
+                                   workers=workers)
+
+                self.check_output(output_dir)
+                self.assertEqual((stats['files'], stats['failed']), (5, 2))
+                self.assertEqual(
+                    [name for name, _ in stats['errors']],
+                    ['a0.txt', os.path.join('sub', 'b.doctree')])
+                self.assertIn('UnicodeDecodeError', stats['errors'][0][1])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            trim_files(self.source_dir, workers=0)
+        with self.assertRaises(re.error):
+            trim_files(self.source_dir, keep_blank_before='[')
+
+    def test_main(self):
+        output_dir = os.path.join(self.tmpdir.name, 'output')
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stderr(stderr):
+            status = main([self.source_dir, '-o', output_dir, '-j', '2',
+                           '--chunksize', '2', '-s', '.txt'])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(self.read(output_dir, 'a.txt'),
+                         'あなたは私を\n食べる\r\nYou eat me\n')
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'sub')))
+        self.assertIn('2 files (1 changed, 0 failed)', stderr.getvalue())
+        self.assertIn('MB/s', stderr.getvalue())
+
+    def test_main_with_broken_file(self):
+        with open(os.path.join(self.source_dir, 'a0.txt'), 'wb') as output:
+            output.write(b'\xff\xfe')
+        stderr = io.StringIO()
+
+        with contextlib.redirect_stderr(stderr):
+            status = main([self.source_dir, '-j', '1'])
+
+        self.assertEqual(status, 1)
+        self.assertEqual(self.read(self.source_dir, 'a.txt'),
+                         'あなたは私を\n食べる\r\nYou eat me\n')
+        self.assertIn(
+            'failed to trim %s: UnicodeDecodeError'
+            % os.path.join(self.source_dir, 'a0.txt'), stderr.getvalue())
+        self.assertIn('4 files (2 changed, 1 failed)', stderr.getvalue())
+
+TEXT_SOURCE = '''\
+テスト の 文書
+**************
+
+これは 日本語の *強調* です。
+
+* 他の 文書
+* 箇条 書き
+
+1. 番号 付き
+2. 項目 です
+
+節 の 題名
+==========
+
+例 です::
+
+   一行目
+   二行目
+
+用語
+   用語 の 説明 です。
+'''
+
+class TextFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmpdir.name, 'source')
+        os.makedirs(self.source_dir)
+        with open(os.path.join(self.source_dir, 'conf.py'), 'w') as output:
+            output.write("extensions = ['sphinxcontrib.trimblank']\n")
+        with open(os.path.join(self.source_dir, 'index.rst'), 'w',
+                  encoding='utf-8') as output:
+            output.write(TEXT_SOURCE)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def build(self, name, enabled):
+        out_dir = os.path.join(self.tmpdir.name, name)
+        app = Sphinx(
+            self.source_dir, self.source_dir, out_dir,
+            os.path.join(out_dir, '.doctrees'), 'text',
+            {'trimblank_enabled': enabled}, status=None,
+            warning=io.StringIO())
+        app.build()
+        return os.path.join(out_dir, 'index.txt')
+
+    def test_trim_text_builder_output(self):
+        # Titles with their underlines, list markers, literal blocks and the
+        # last line break are kept as the text builder writes them from a
+        # trimmed doctree.
+        path = self.build('untrimmed', False)
+        with open(self.build('trimmed', True), encoding='utf-8') as output:
+            expected = output.read()
+        destination = os.path.join(self.tmpdir.name, 'index.txt')
+
+        trim_file(path, destination,
+                  Trimmer(False, r'[\s(]', r'[\s),.:?]'))
+
+        with open(destination, encoding='utf-8') as output:
+            self.assertEqual(output.read(), expected)
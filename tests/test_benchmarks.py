@@ -0,0 +1,24 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from benchmarks import run
+
+class BenchmarksTest(unittest.TestCase):
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'results.json')
+            with contextlib.redirect_stderr(io.StringIO()):
+                status = run.main([
+                    '--scale', 'small', '--shape', 'small_paragraphs',
+                    '--script', 'japanese', '--repeat', '1', '--output', path])
+            with open(path) as results:
+                report = json.load(results)
+
+        self.assertEqual(status, 0)
+        self.assertIn('handler/small_paragraphs/japanese/small',
+                      report['results'])
+        self.assertIn('trimmer.table.trim_blank/small_paragraphs/japanese/small',
+                      report['results'])
@@ -0,0 +1,78 @@
+import unittest
+from docutils import nodes
+from sphinxcontrib.trimblank import (
+    CharRanges, contains_cjk, has_cjk_text, is_cjk_char)
+
+class CjkTextTest(unittest.TestCase):
+    def test_is_cjk_char(self):
+        datalist = [
+            ('a', False), (' ', False), ('é', False), ('가', False),
+            ('あ', True), ('漢', True), ('Ａ', True), ('￦', True),
+            ('⹿', False), ('⺀', True), ('鿿', True),
+            ('\U00020000', True), ('\U0003FFFF', True), ('\U00040000', False),
+        ]
+        for char, expected in datalist:
+            with self.subTest(char=char):
+                self.assertEqual(is_cjk_char(char), expected)
+
+    def test_contains_cjk(self):
+        datalist = [
+            ('', False), ('You eat me', False), ('Café', False),
+            ('You は me', True), ('あなたは', True),
+        ]
+        for txt, expected in datalist:
+            with self.subTest(txt=txt):
+                self.assertEqual(contains_cjk(txt), expected)
+
+    def test_has_cjk_text(self):
+        datalist = [
+            (nodes.paragraph(text='You eat me'), False),
+            (nodes.paragraph('', '', nodes.Text(''), nodes.Text('You')), False),
+            (nodes.paragraph(
+                '', '', nodes.Text('You '),
+                nodes.reference('', '', nodes.strong(text='私'))), True),
+            (nodes.paragraph('', '', nodes.image(alt='画像')), True),
+        ]
+        for node, expected in datalist:
+            with self.subTest(node=node):
+                self.assertEqual(has_cjk_text(node), expected)
+
+class CharRangesTest(unittest.TestCase):
+    def test_intervals(self):
+        char_ranges = CharRanges(
+            [(0x3040, 0x309F), ('ァ', 'ヿ'), (0x30A0, 0x30A0), ('가', '힣')])
+
+        self.assertEqual(char_ranges.intervals,
+                         ((0x3040, 0x30FF), (0xAC00, 0xD7A3)))
+        for char, expected in [('あ', True), ('ア', True), ('가', True),
+                               ('漢', False), ('a', False), ('\u30FF', True),
+                               ('\u3100', False)]:
+            with self.subTest(char=char):
+                self.assertEqual(char_ranges[char], expected)
+                self.assertEqual(is_cjk_char(char, char_ranges), expected)
+
+    def test_empty_intervals(self):
+        char_ranges = CharRanges([])
+
+        self.assertFalse(contains_cjk('あいう', char_ranges))
+        self.assertFalse(has_cjk_text(nodes.paragraph(text='あ'), char_ranges))
+
+    def test_invalid_intervals(self):
+        for interval in [(2, 1), (1,), ('ab', 'c'), (-1, 0), (0, 0x110000),
+                         (1.0, 2.0), 1]:
+            with self.subTest(interval=interval):
+                self.assertRaises(ValueError, CharRanges, [interval])
+
+    def test_ends_with(self):
+        char_ranges = CharRanges([('あ', 'ん')])
+        datalist = [
+            ('', False, False), ('あ', True, False), ('aあ', True, False),
+            ('あa', False, False), ('あ\n', True, True), ('あ \n', False, True),
+            ('あ\n\n', False, True), ('\n', False, False),
+            ('あ ', False, True), (' ', False, False),
+        ]
+        for txt, expected, expected_blank in datalist:
+            with self.subTest(txt=txt):
+                self.assertEqual(char_ranges.ends_with(txt), expected)
+                self.assertEqual(char_ranges.ends_with(txt, blank=True),
+                                 expected_blank)
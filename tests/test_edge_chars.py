@@ -0,0 +1,38 @@
+import unittest
+from docutils import nodes
+from sphinxcontrib.trimblank import get_head_chars, get_tail_chars
+
+class EdgeCharsTest(unittest.TestCase):
+    def test_text(self):
+        datalist = [
+            ('あなたは', 'あ', 'は'),
+            ('', '', ''),
+            ('\x00 あなたは\x00\n', 'あ', 'は'),
+            ('a\x00\x00 ', 'a', 'a'),
+            (' あ\n', ' ', '\n'),
+        ]
+        for txt, head, tail in datalist:
+            with self.subTest(txt=txt):
+                node = nodes.Text(txt)
+
+                self.assertEqual(get_head_chars(node), head)
+                self.assertEqual(get_tail_chars(node), tail)
+                self.assertEqual(get_head_chars(node, 2), node.astext()[:2])
+                self.assertEqual(get_tail_chars(node, 2), node.astext()[-2:])
+
+    def test_element(self):
+        datalist = [
+            nodes.strong(text='あなたは'),
+            nodes.reference(
+                '', '', nodes.Text(''), nodes.emphasis(text='私を'),
+                nodes.Text('食べる\n'), nodes.Text('')),
+            nodes.paragraph(),
+            nodes.section('', nodes.paragraph(text='あ'), nodes.paragraph()),
+            nodes.image(alt='イメージ'),
+        ]
+        for node in datalist:
+            with self.subTest(node=node):
+                txt = node.astext()
+                for count in (1, 2, 3):
+                    self.assertEqual(get_head_chars(node, count), txt[:count])
+                    self.assertEqual(get_tail_chars(node, count), txt[-count:])
@@ -0,0 +1,63 @@
+import random
+import sys
+import tracemalloc
+import unittest
+from unittest import mock
+from unittest.mock import Mock
+from docutils import nodes
+from benchmarks.table_trimmer import TableTrimmer
+from sphinxcontrib.trimblank import Trimmer, TrimblankVisitor
+
+def make_text(size, seed=0):
+    rand = random.Random(seed)
+    words = ['日本語', 'の', '文章', 'です', '。', '(abc)', 'def', ' ', '\n']
+    parts = []
+    length = 0
+    while length < size:
+        word = rand.choice(words) + rand.choice([' ', '', '\n', ''])
+        parts.append(word)
+        length += len(word)
+    return ''.join(parts)
+
+class LargeTextTest(unittest.TestCase):
+    def make_trimmers(self):
+        return [cls(keep_alnum_blank, r'[\s(]', r'[\s),.:?]')
+                for cls in (Trimmer, TableTrimmer)
+                for keep_alnum_blank in (False, True)]
+
+    def test_chunks_give_same_result(self):
+        for seed in range(20):
+            txt = make_text(200, seed)
+            for trimmer in self.make_trimmers():
+                expected = trimmer.trim_blank(txt)
+                for chunk_size in (1, 2, 3, 16):
+                    with self.subTest(seed=seed, trimmer=trimmer,
+                                      chunk_size=chunk_size), \
+                            mock.patch.object(Trimmer, 'CHUNK_SIZE',
+                                              chunk_size):
+                        self.assertEqual(trimmer.trim_blank(txt), expected)
+
+    def test_unchanged_text_is_not_copied(self):
+        txt = 'You eat me ' * 10000
+        for trimmer in self.make_trimmers():
+            self.assertIs(trimmer.trim_blank(txt), txt)
+
+    def test_peak_memory(self):
+        txt = make_text(300000)
+        input_size = sys.getsizeof(txt)
+        for cls in (Trimmer, TableTrimmer):
+            trimmer = cls(False, r'[\s(]', r'[\s),.:?]')
+            document = nodes.document(Mock(), Mock())
+            document += nodes.paragraph(
+                '', '', nodes.Text(' ' + txt + ' '), nodes.strong(text='あ'),
+                nodes.Text(txt))
+            tracemalloc.start()
+            try:
+                TrimblankVisitor(document, trimmer).traverse(document)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            with self.subTest(trimmer=trimmer):
+                self.assertNotEqual(document[0][0], ' ' + txt + ' ')
+                # The new text and its chunks, besides the node itself.
+                self.assertLess(peak, 4 * input_size)
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import Mock
+from docutils import nodes
+from sphinxcontrib.trimblank import (
+    Trimmer, TrimblankVisitor, add_profile, rank_profiles, run_profiled)
+
+def make_doctree():
+    doctree = nodes.document(Mock(), Mock())
+    doctree.extend([
+        nodes.paragraph(
+            '', '', nodes.Text('あなたは '), nodes.strong(text='私を'),
+            nodes.Text(' 食べる')),
+        nodes.literal_block(text='あなたは 私を'),
+    ])
+    return doctree
+
+def trim(doctree):
+    trimmer = Trimmer(False, r'[\s(]', r'[\s),.:?]')
+    TrimblankVisitor(doctree, trimmer).traverse(doctree)
+    return 'trimmed'
+
+class ProfilingTest(unittest.TestCase):
+    def test_run_profiled(self):
+        doctree = make_doctree()
+
+        result, profile = run_profiled(doctree, False, trim, doctree)
+
+        self.assertEqual(result, 'trimmed')
+        self.assertEqual(doctree[0].astext(), 'あなたは私を食べる')
+        self.assertEqual(sorted(profile), ['chars', 'texts', 'time'])
+        self.assertEqual((profile['texts'], profile['chars']), (4, 18))
+        self.assertGreater(profile['time'], 0)
+
+    def test_run_profiled_with_stats(self):
+        doctree = make_doctree()
+
+        _, profile = run_profiled(doctree, True, trim, doctree)
+
+        self.assertIn('traverse',
+                      [function for _, _, function in profile['stats']])
+
+    def test_add_profile_keeps_stats_of_slowest(self):
+        profiles, stats = {}, {}
+        for docname, elapsed in [('a', 3), ('b', 1), ('c', 2), ('d', 4)]:
+            add_profile(profiles, stats, docname,
+                        {'time': elapsed, 'texts': 1, 'chars': 2,
+                         'stats': {docname: elapsed}}, 2)
+
+        self.assertEqual(sorted(profiles), ['a', 'b', 'c', 'd'])
+        self.assertEqual(profiles['b'], {'time': 1, 'texts': 1, 'chars': 2})
+        self.assertEqual(stats, {'a': {'a': 3}, 'd': {'d': 4}})
+
+    def test_rank_profiles(self):
+        read_profiles = {'a': {'time': 2, 'texts': 3, 'chars': 10},
+                         'b': {'time': 1, 'texts': 1, 'chars': 5}}
+        write_profiles = {'a': {'time': 1, 'texts': 4, 'chars': 12},
+                          'b': {'time': 1, 'texts': 1, 'chars': 5},
+                          'c': {'time': 4, 'texts': 9, 'chars': 90}}
+
+        num_docs, total, rows = rank_profiles(
+            read_profiles, write_profiles, 2)
+
+        self.assertEqual((num_docs, total), (3, 9))
+        self.assertEqual(rows, [('c', 4, 0, 4, 9, 90), ('a', 3, 2, 1, 4, 12)])
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import Mock
+from docutils.core import publish_doctree
+from sphinxcontrib.trimblank import (
+    SourceTrimmer, Trimmer, TrimblankVisitor, trimblank_source)
+
+def parse_and_trim(source, trimmer):
+    doctree = publish_doctree(source, settings_overrides={
+        'report_level': 5, 'halt_level': 5, 'warning_stream': False})
+    TrimblankVisitor(doctree, trimmer).traverse(doctree)
+    return doctree.pformat()
+
+class SourceTrimmerTest(unittest.TestCase):
+    def setUp(self):
+        self.trimmer = Trimmer(False, r'[\s(]', r'[\s),.:?]')
+        self.source_trimmer = SourceTrimmer([self.trimmer])
+
+    def check(self, source, expected):
+        result = self.source_trimmer.trim_source(source)
+        self.assertEqual(result, expected)
+        self.assertEqual(result.count('\n'), source.count('\n'))
+        self.assertEqual(parse_and_trim(result, self.trimmer),
+                         parse_and_trim(source, self.trimmer))
+
+    def test_paragraph(self):
+        self.check('これは日本語の\n文章です。\nEnglish\ntext\n\n次の\n段落\n',
+                   'これは日本語の文章です。\nEnglish\ntext\n\n\n次の段落\n\n')
+
+    def test_indented_paragraph(self):
+        self.check('.. note::\n\n   注記の\n   本文です。\n\n- 項目の\n'
+                   '  説明の\n  続きです。\n',
+                   '.. note::\n\n   注記の本文です。\n\n\n- 項目の\n'
+                   '  説明の続きです。\n\n')
+
+    def test_keep_blank_patterns(self):
+        trimmer = Trimmer(False, r'[\s(「]', r'[\s),.:?う]')
+        self.source_trimmer = SourceTrimmer([self.trimmer, trimmer])
+        self.trimmer = trimmer
+        self.check('あいう\n「かぎ」\nです\n\n',
+                   'あいう\n「かぎ」です\n\n\n')
+
+    def test_literal_blocks(self):
+        source = ('例::\n\n    コード\n    ブロック\n\n'
+                  '引用::\n\n> あいう\n> えお\n\n'
+                  '.. code:: python\n\n   あいう\n   えお\n\n'
+                  '>>> print("あいう")\nあいう\nえお\n')
+        self.check(source, source)
+
+    def test_comments_and_tables(self):
+        source = ('.. コメント\n   です\n\n'
+                  '=====  =====\nあいう  えお\nかき   くけ\n\n'
+                  'さし   すせ\nたち   つて\n=====  =====\n\n'
+                  '+------+\n| あい |\n| うえ |\n+------+\n')
+        self.check(source, source)
+
+    def test_titles(self):
+        source = 'タイトル\n========\n\n見出し\nです\n------\n'
+        self.check(source, source)
+
+    def test_inline_markup(self):
+        source = ('次は ``インライン\nリテラル`` と `解釈\nテキスト`\n\n'
+                  '|置換\n参照| と `参照`（括弧） あ\nい\n\n'
+                  'あいう\nえお_ と [あ\nい]_\n')
+        self.check(source, source)
+
+class TrimblankSourceTest(unittest.TestCase):
+    def make_app(self, **kwargs):
+        values = {
+            'trimblank_trim_source': True,
+            'trimblank_enabled': True,
+            'trimblank_keep_alnum_blank': ['latex'],
+            'trimblank_keep_blank_before': r'[\s(]',
+            'trimblank_keep_blank_after': r'[\s),.:?]',
+            'trimblank_cache_size': 0,
+            'trimblank_char_ranges': Trimmer.CJK_INTERVALS,
+            'source_suffix': {'.rst': 'restructuredtext', '.md': 'markdown'},
+        }
+        values.update(kwargs)
+        app = Mock(config=Mock(**values))
+        app.env.doc2path = lambda docname: docname
+        return app
+
+    def test_trim_source(self):
+        source = ['あいう\nえお\n']
+        trimblank_source(self.make_app(), 'index.rst', source)
+        self.assertEqual(source, ['あいうえお\n\n'])
+
+    def test_not_trimmed(self):
+        for docname, kwargs in (
+                ('index.rst', {'trimblank_trim_source': False}),
+                ('index.rst', {'trimblank_enabled': ['html']}),
+                ('index.md', {}),
+                ('index.txt', {})):
+            source = ['あいう\nえお\n']
+            trimblank_source(self.make_app(**kwargs), docname, source)
+            self.assertEqual(source, ['あいう\nえお\n'])
@@ -0,0 +1,222 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from docutils import nodes
+from sphinx import addnodes
+from sphinx.application import Sphinx
+from sphinxcontrib.trimblank import (
+    ReadTrimblankVisitor, ResolvedTrimblankVisitor, Trimmer, TrimblankVisitor,
+    get_variant_keys, match_read_targets)
+
+def make_doctree():
+    doctree = nodes.document(Mock(), Mock())
+    doctree.extend([
+        nodes.paragraph(
+            '', '', nodes.Text('あなたは '), nodes.strong(text='私を'),
+            nodes.Text(' 食べる')),
+        nodes.paragraph('', '', nodes.Text('You eat me')),
+        nodes.paragraph('', '', nodes.Text('あなたは私を')),
+        nodes.literal_block(text='あなたは 私を'),
+        nodes.paragraph('', '', nodes.Text('あなたは '),
+                        addnodes.pending_xref('', nodes.Text('私を')),
+                        nodes.Text(' 食べる (abc)')),
+    ])
+    return doctree
+
+class TrimAtReadTest(unittest.TestCase):
+    def setUp(self):
+        self.trimmers = {
+            False: Trimmer(False, r'[\s(]', r'[\s),.:?]'),
+            True: Trimmer(True, r'[\s(]', r'[\s),.:?]'),
+        }
+        self.config = Mock(trimblank_skip_nodes=[], trimblank_skip_classes=[])
+
+    def read(self, doctree, key):
+        visitor = ReadTrimblankVisitor(doctree, self.trimmers.get(key))
+        visitor.others = {
+            other: None if other is None else TrimblankVisitor(
+                doctree, self.trimmers[other])
+            for other in (None, False, True) if other != key}
+        visitor.unresolved = addnodes.pending_xref
+        visitor.trim_and_record(doctree)
+        return {'key': key, 'shapes': visitor.shapes, 'texts': visitor.texts}
+
+    def resolve(self, doctree, record, key, trimmer):
+        matched = match_read_targets(
+            doctree, 'index', {'index': record}, self.config)
+        visitor = ResolvedTrimblankVisitor(doctree, trimmer)
+        visitor.key = key
+        visitor.matched = matched
+        visitor.traverse(doctree)
+        return visitor
+
+    def test_read_trims_in_place(self):
+        doctree = make_doctree()
+
+        record = self.read(doctree, False)
+
+        self.assertEqual(doctree[0].astext(), 'あなたは私を食べる')
+        self.assertEqual(doctree[4].astext(), 'あなたは 私を 食べる (abc)')
+        self.assertEqual(sorted(record['shapes']), [(0,), (1,), (2,)])
+        self.assertEqual(record['texts'][None],
+                         {(0,): ('あなたは ', '私を', ' 食べる')})
+        self.assertEqual(record['texts'][True], {})
+
+    def test_record_has_no_nodes(self):
+        doctree = make_doctree()
+
+        record = self.read(doctree, True)
+
+        texts = [txt for variants in record['texts'].values()
+                 for variant in variants.values() for txt in variant]
+        self.assertTrue(texts)
+        self.assertEqual({type(txt) for txt in texts}, {str})
+        self.assertFalse([value for shape in record['shapes'].values()
+                          for value in shape
+                          if isinstance(value, nodes.Node)])
+
+    def test_resolve_matches_visitor(self):
+        for read_key in (False, True):
+            for key in (None, False, True):
+                with self.subTest(read_key=read_key, key=key):
+                    expected = make_doctree()
+                    if key is not None:
+                        TrimblankVisitor(
+                            expected, self.trimmers[key]).traverse(expected)
+                    doctree = make_doctree()
+                    record = self.read(doctree, read_key)
+                    trimmer = Mock(wraps=self.trimmers.get(key),
+                                   char_ranges=self.trimmers[False].char_ranges)
+
+                    visitor = self.resolve(
+                        doctree, record, key,
+                        None if key is None else trimmer)
+
+                    self.assertEqual(doctree.pformat(), expected.pformat())
+                    self.assertEqual(visitor.num_reused, 3)
+                    # Only the texts of the target with a pending_xref are
+                    # trimmed again.
+                    self.assertEqual(
+                        [call[1][0] for call in trimmer.trim_blank.mock_calls],
+                        [] if key is None else ['あなたは ', ' 食べる (abc)'])
+
+    def test_resolve_trims_changed_target(self):
+        doctree = make_doctree()
+        record = self.read(doctree, False)
+        doctree.insert(0, nodes.paragraph('', '', nodes.Text('未知の 段落')))
+        doctree[1].append(nodes.Text(' 追加'))
+
+        visitor = self.resolve(doctree, record, False, self.trimmers[False])
+
+        self.assertEqual(doctree[0].astext(), '未知の段落')
+        self.assertEqual(doctree[1].astext(), 'あなたは私を食べる追加')
+        self.assertEqual(visitor.num_reused, 0)
+
+SOURCE = '''\
+テスト
+****
+
+これは
+日本語の *強調
+テキスト* です。 English text
+here and **太字** も。
+
+.. glossary::
+
+   用語 の 名前
+      用語 の 説明 です。
+
+.. only:: html
+
+   HTML だけ の
+   段落 です。
+
+.. only:: latex
+
+   LaTeX だけ の
+   段落 です。
+
+後ろ の 段落 [#f]_ があります。 See :ref:`label`.
+
+.. _label:
+
+節 の 題名
+==========
+
+.. [#f] 脚注 の
+   本文 です。
+'''
+
+# The file of the main output of each builder.
+OUTPUT_FILES = {'html': 'index.html', 'latex': 'test.tex', 'text': 'index.txt'}
+
+class BuildTest(unittest.TestCase):
+    # Builds of a project trimmed at read should give the same outputs as
+    # normal builds, also for builders which trimming is disabled for and
+    # share the doctrees trimmed for another builder.
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmpdir.name, 'source')
+        os.makedirs(self.source_dir)
+        with open(os.path.join(self.source_dir, 'conf.py'), 'w') as output:
+            output.write("extensions = ['sphinxcontrib.trimblank']\n"
+                         "latex_documents = [('index', 'test.tex', 'test', "
+                         "'author', 'manual')]\n")
+        with open(os.path.join(self.source_dir, 'index.rst'), 'w',
+                  encoding='utf-8') as output:
+            output.write(SOURCE)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def build(self, name, builder_name, trim_at_read):
+        out_dir = os.path.join(self.tmpdir.name, name, builder_name)
+        app = Sphinx(
+            self.source_dir, self.source_dir, out_dir,
+            os.path.join(self.tmpdir.name, name, '.doctrees'), builder_name,
+            {'trimblank_enabled': ['html', 'latex'],
+             'trimblank_keep_alnum_blank': ['latex'],
+             'trimblank_trim_at_read': trim_at_read},
+            status=None, warning=io.StringIO())
+        app.build()
+        with open(os.path.join(out_dir, OUTPUT_FILES[builder_name]),
+                  encoding='utf-8') as output:
+            return output.read()
+
+    def test_build_matches_normal_build(self):
+        expected = {builder_name: self.build('normal', builder_name, False)
+                    for builder_name in OUTPUT_FILES}
+        # The doctrees are read (and trimmed) by the first builder, and
+        # shared by the others.
+        for first in OUTPUT_FILES:
+            for builder_name in [first] + sorted(set(OUTPUT_FILES) - {first}):
+                with self.subTest(first=first, builder_name=builder_name):
+                    output = self.build('read_' + first, builder_name, True)
+
+                    self.assertEqual(output, expected[builder_name])
+
+class GetVariantKeysTest(unittest.TestCase):
+    def test_get_variant_keys(self):
+        datalist = [
+            (True, False, 'html', False, [False]),
+            (True, True, 'html', False, [True]),
+            (False, False, 'html', False, []),
+            (True, ['latex'], 'html', False, [False, True]),
+            (['html'], ['latex'], 'html', False, [False]),
+            (['html'], ['html'], 'latex', False, [True]),
+            (['html'], ['html'], 'latex', True, [None, True]),
+            (True, False, 'html', True, [False]),
+        ]
+        for enabled, keep_alnum_blank, builder_name, disabled, expected \
+                in datalist:
+            with self.subTest(enabled=enabled,
+                              keep_alnum_blank=keep_alnum_blank,
+                              builder_name=builder_name, disabled=disabled):
+                config = Mock(trimblank_enabled=enabled,
+                              trimblank_keep_alnum_blank=keep_alnum_blank)
+
+                result = get_variant_keys(config, builder_name, disabled)
+
+                self.assertEqual(result, expected)
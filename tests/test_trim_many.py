@@ -0,0 +1,62 @@
+import types
+import unittest
+from sphinxcontrib.trimblank import Trimmer, get_shared_trimmer, trim_many
+
+class TrimManyTest(unittest.TestCase):
+    def test_trim_many(self):
+        segments = ['あなたは 私を', 'You eat me', '', ' 食べる ', 'あ\uFFFF い']
+
+        results = trim_many(segments, batch_size=2)
+
+        self.assertIsInstance(results, types.GeneratorType)
+        self.assertEqual(list(results),
+                         ['あなたは私を', 'You eat me', '', '食べる', 'あ\uFFFFい'])
+
+    def test_same_as_trim_blank(self):
+        segments = ['あなたは %d 私を\n食べる (%d)' % (idx, idx)
+                    for idx in range(1000)]
+        for keep_alnum_blank in (False, True):
+            with self.subTest(keep_alnum_blank=keep_alnum_blank):
+                trimmer = Trimmer(keep_alnum_blank, r'[\s(]', r'[\s),.:?]')
+
+                self.assertEqual(
+                    list(trim_many(iter(segments),
+                                   keep_alnum_blank=keep_alnum_blank)),
+                    [trimmer.trim_blank(txt) for txt in segments])
+
+    def test_boundaries(self):
+        segments = [
+            ('あなたは', ' You ', '食べる'),
+            ('eat', ' You ', 'me'),
+            (None, ' You ', None),
+            ('', ' You ', ''),
+            ('あなたは', ' (You) ', '食べる'),
+        ]
+
+        results = list(trim_many(segments, boundaries=True))
+
+        self.assertEqual(results, ['You', ' You ', ' You ', ' You ', ' (You) '])
+        self.assertEqual(
+            list(trim_many(segments[:2], boundaries=True,
+                           keep_alnum_blank=True)),
+            [' You ', ' You '])
+
+    def test_char_ranges(self):
+        self.assertEqual(
+            list(trim_many(['한국어 문장', '日本語 の'],
+                           char_ranges=[('가', '힣')])),
+            ['한국어문장', '日本語 の'])
+
+    def test_shared_trimmer(self):
+        options = (0, None, False, r'[\s(]', r'[\s),.:?]')
+
+        self.assertIs(get_shared_trimmer(*options), get_shared_trimmer(
+            0, list(Trimmer.CJK_INTERVALS), False, r'[\s(]', r'[\s),.:?]'))
+        self.assertIsNot(get_shared_trimmer(*options),
+                         get_shared_trimmer(8, *options[1:]))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            trim_many([], batch_size=0)
+        with self.assertRaises(ValueError):
+            trim_many([], char_ranges=[(2, 1)])
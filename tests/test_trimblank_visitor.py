@@ -1,11 +1,11 @@
 import unittest
 from unittest.mock import Mock
 from docutils import nodes
-from sphinxcontrib.trimblank import TrimblankVisitor
+from sphinxcontrib.trimblank import CJK_RANGES, TrimblankVisitor, findall
 
 class TrimblankVisitorTest(unittest.TestCase):
     def setUp(self):
-        self.trimmer = Mock()
+        self.trimmer = Mock(char_ranges=CJK_RANGES)
         self.trimmer.trim_blank.side_effect = lambda txt: 'blank(%s)' % txt
         self.trimmer.trim_head.side_effect = lambda txt, p: 'head(%s)' % txt
         self.trimmer.trim_tail.side_effect = lambda txt, n: 'tail(%s)' % txt
@@ -141,3 +141,113 @@ class TrimblankVisitorTest(unittest.TestCase):
         self.assertEqual(
             self.text_elem.astext(),
             'tail(blank(あなたは))head(blank(私を食べる))')
+
+    def test_unchanged_text_is_reused(self):
+        self.trimmer.trim_blank.side_effect = lambda txt: txt.rstrip()
+        self.trimmer.trim_head.side_effect = lambda txt, p: txt
+        self.trimmer.trim_tail.side_effect = lambda txt, n: txt
+        elems = [nodes.Text('あなたは'), nodes.strong(text='私を'),
+                 nodes.Text('食べる ')]
+        self.text_elem.extend(elems)
+
+        self.assertRaises(
+            nodes.SkipChildren, self.sut.default_visit, self.text_elem)
+
+        self.assertIs(self.text_elem[0], elems[0])
+        self.assertIs(self.text_elem[1], elems[1])
+        self.assertIsNot(self.text_elem[2], elems[2])
+        self.assertEqual(self.text_elem[2], '食べる')
+        self.assertIs(self.text_elem[2].parent, self.text_elem)
+
+    def test_with_non_cjk_text(self):
+        elems = [nodes.Text('You eat '), nodes.strong(text='me')]
+        self.text_elem.extend(elems)
+
+        self.assertRaises(
+            nodes.SkipChildren, self.sut.default_visit, self.text_elem)
+
+        self.assertEqual(self.text_elem.astext(), 'You eat me')
+        self.trimmer.trim_blank.assert_not_called()
+        self.assertEqual(self.sut.num_skipped, 1)
+        self.assertEqual(self.sut.num_trimmed, 0)
+
+    def test_metrics(self):
+        self.trimmer.trim_blank.side_effect = lambda txt: txt.replace(' ', '')
+        self.trimmer.trim_head.side_effect = lambda txt, p: txt
+        self.trimmer.trim_tail.side_effect = lambda txt, n: txt
+        self.sut.samples = []
+        self.sut.max_samples = 1
+        elems = [nodes.Text('あなたは 私を'), nodes.strong(text='食べる'),
+                 nodes.Text('あ な た')]
+        self.text_elem.extend(elems)
+
+        self.assertRaises(
+            nodes.SkipChildren, self.sut.default_visit, self.text_elem)
+
+        self.assertEqual(self.sut.num_visited, 1)
+        self.assertEqual(self.sut.num_trimmed, 1)
+        self.assertEqual(self.sut.num_changed, 2)
+        self.assertEqual(self.sut.num_removed, 3)
+        self.assertEqual(
+            self.sut.samples, [(None, 'あなたは 私を', 'あなたは私を')])
+
+    def test_traverse(self):
+        document = nodes.document(Mock(), Mock())
+        document += nodes.section(
+            '', nodes.title(text='あなたは'),
+            nodes.paragraph(text='私を食べる'),
+            nodes.literal_block(text='あなたは'),
+            nodes.bullet_list('', nodes.list_item(
+                '', nodes.paragraph(text='あなたは'))))
+
+        self.sut.traverse(document)
+
+        self.assertEqual(
+            [node.astext() for node in findall(document, nodes.TextElement)],
+            ['blank(あなたは)', 'blank(私を食べる)', 'あなたは',
+             'blank(あなたは)'])
+
+    def test_traverse_with_skip_nodes_and_classes(self):
+        document = nodes.document(Mock(), Mock())
+        document += nodes.section(
+            '', nodes.title(text='あなたは'),
+            nodes.table('', nodes.tgroup('', nodes.tbody('', nodes.row(
+                '', nodes.entry('', nodes.paragraph(text='私を')))))),
+            nodes.container(
+                '', nodes.paragraph(text='食べる'), classes=['generated']),
+            nodes.paragraph(text='あなたは', classes=['generated']),
+            nodes.paragraph(text='私を', classes=['prose']))
+        self.sut.skip_nodes = (nodes.table,)
+        self.sut.skip_classes = frozenset(['generated'])
+
+        self.sut.traverse(document)
+
+        self.assertEqual(
+            [node.astext() for node in findall(document, nodes.TextElement)],
+            ['blank(あなたは)', '私を', '食べる', 'あなたは', 'blank(私を)'])
+        self.assertEqual(self.sut.num_pruned, 3)
+
+        walked = nodes.document(Mock(), Mock())
+        walked += nodes.paragraph(text='あなたは', classes=['generated'])
+        walked += nodes.table('', nodes.paragraph(text='私を'))
+        walked.walk(self.sut)
+        self.assertEqual(walked.astext(), 'あなたは\n\n私を')
+
+    def test_traverse_deeply_nested_inline_element(self):
+        self.trimmer.trim_blank.side_effect = lambda txt: txt.strip()
+        self.trimmer.trim_head.side_effect = lambda txt, p: txt
+        self.trimmer.trim_tail.side_effect = lambda txt, n: txt
+        document = nodes.document(Mock(), Mock())
+        parent = nodes.paragraph()
+        document += parent
+        for _ in range(5000):
+            parent += nodes.Text(' あ ')
+            parent += nodes.strong()
+            parent = parent[-1]
+
+        self.sut.traverse(document)
+
+        node = document[0]
+        for _ in range(5000):
+            self.assertEqual(node[0], 'あ')
+            node = node[1]
@@ -1,5 +1,8 @@
 import unittest
-from sphinxcontrib.trimblank import Trimmer
+import random
+from unittest.mock import Mock, patch
+from benchmarks.table_trimmer import TableTrimmer
+from sphinxcontrib.trimblank import CachingTrimmer, Trimmer
 
 class TrimmerWithoutKeepBlankTest(unittest.TestCase):
     def setUp(self):
@@ -180,3 +183,117 @@ class TrimmerWithKeepBlankTest(unittest.TestCase):
                 result = self.sut.trim_tail(txt, next_txt)
 
                 self.assertEqual(result, expected)
+
+class TrimmerPatternTest(unittest.TestCase):
+    def test_alternatives_are_anchored(self):
+        sut = Trimmer(False, r'\s|\(', r'\s|\)')
+
+        self.assertEqual(sut.trim_head(' (あ', 'い'), ' (あ')
+        self.assertEqual(sut.trim_head(' あ (', 'い'), 'あ (')
+        self.assertEqual(sut.trim_tail('あ) ', 'い'), 'あ) ')
+        self.assertEqual(sut.trim_tail('あ い ', 'う'), 'あ い')
+
+    def test_without_pattern_width(self):
+        with patch('sphinxcontrib.trimblank.trimmer.sre_parse', None):
+            sut = Trimmer(False, r'[:\s]', r'[,.\s]')
+
+        self.assertEqual(sut.trim_tail('あ, ' * 10, 'い'), 'あ, ' * 10)
+        self.assertEqual(sut.trim_tail('あう' * 10 + ' ', 'い'), 'あう' * 10)
+        self.assertEqual(sut.trim_blanks(['あ い', 'う ', ' え']),
+                         ['あい', 'う', 'え'])
+
+class TableTrimmerWithoutKeepBlankTest(TrimmerWithoutKeepBlankTest):
+    def setUp(self):
+        self.sut = TableTrimmer(False, r'[:\s]', r'[,.\s]')
+
+class TableTrimmerWithKeepBlankTest(TrimmerWithKeepBlankTest):
+    def setUp(self):
+        self.sut = TableTrimmer(True, r'[:\s]', r'[,.\s]')
+
+class TableTrimmerTest(unittest.TestCase):
+    CHARS = ['あ', '漢', 'ａ', 'a', ' ', '\n', '\u3000', '(', ')', ',', ':']
+
+    def make_text(self, rand):
+        return ''.join(
+            rand.choice(self.CHARS) for _ in range(rand.randint(0, 6)))
+
+    def test_same_as_trimmer(self):
+        rand = random.Random(0)
+        for args in [(False, r'[\s(]', r'[\s),.:?]'),
+                     (True, r'[\s(]', r'[\s),.:?]'),
+                     (False, r'[^あ]', r'.')]:
+            trimmer, sut = Trimmer(*args), TableTrimmer(*args)
+            for _ in range(1000):
+                txt, other_txt = self.make_text(rand), self.make_text(rand)
+                with self.subTest(args=args, txt=txt, other_txt=other_txt):
+                    self.assertEqual(
+                        sut.trim_blank(txt), trimmer.trim_blank(txt))
+                    self.assertEqual(sut.trim_head(txt, other_txt),
+                                     trimmer.trim_head(txt, other_txt))
+                    self.assertEqual(sut.trim_tail(txt, other_txt),
+                                     trimmer.trim_tail(txt, other_txt))
+
+    def test_pattern_not_matching_single_character(self):
+        for args in [(False, r'[\s(]+', r'[\s)]'),
+                     (False, r'[\s(]', r'\)\.')]:
+            with self.subTest(args=args):
+                self.assertRaises(ValueError, TableTrimmer, *args)
+
+class CachingTrimmerWithoutKeepBlankTest(TrimmerWithoutKeepBlankTest):
+    def setUp(self):
+        self.sut = CachingTrimmer(Trimmer(False, r'[:\s]', r'[,.\s]'), 4)
+
+class CachingTrimmerWithKeepBlankTest(TrimmerWithKeepBlankTest):
+    def setUp(self):
+        self.sut = CachingTrimmer(Trimmer(True, r'[:\s]', r'[,.\s]'), 4)
+
+class CachingTrimmerTest(unittest.TestCase):
+    def setUp(self):
+        self.trimmer = Mock(wraps=Trimmer(False, r'[\s(]', r'[\s),.:?]'))
+        self.sut = CachingTrimmer(self.trimmer, 2)
+
+    def test_hit(self):
+        self.sut = CachingTrimmer(self.trimmer, 3)
+        for _ in range(3):
+            self.assertEqual(self.sut.trim_blank('あなたは 私を'), 'あなたは私を')
+            self.assertEqual(self.sut.trim_head(' 私を', 'は'), '私を')
+            self.assertEqual(self.sut.trim_head(' 私を', 'a'), '私を')
+
+        self.assertEqual(self.trimmer.trim_blank.call_count, 1)
+        self.assertEqual(self.trimmer.trim_head.call_count, 2)
+        self.assertEqual(
+            self.sut.cache_info(),
+            {'hits': 6, 'misses': 3, 'size': 3, 'maxsize': 3})
+
+    def test_least_recently_used_is_evicted(self):
+        self.sut.trim_blank('あ い')
+        self.sut.trim_blank('う え')
+        self.sut.trim_blank('あ い')
+        self.sut.trim_blank('お か')
+        self.sut.trim_blank('あ い')
+        self.sut.trim_blank('う え')
+
+        self.assertEqual(
+            [call[0][0] for call in self.trimmer.trim_blank.call_args_list],
+            ['あ い', 'う え', 'お か', 'う え'])
+
+    def test_trim_blanks(self):
+        self.sut.trim_blank('あ い')
+
+        result = self.sut.trim_blanks(['あ い', 'う え', ''])
+
+        self.assertEqual(result, ['あい', 'うえ', ''])
+        self.trimmer.trim_blanks.assert_called_once_with(['う え', ''])
+
+    def test_large_text_is_not_cached(self):
+        txt = 'あ い' * (Trimmer.CHUNK_SIZE // 3 + 1)
+
+        for _ in range(2):
+            self.assertEqual(self.sut.trim_blank(txt), txt.replace(' ', ''))
+            self.assertEqual(self.sut.trim_blanks([txt, 'う え']),
+                             [txt.replace(' ', ''), 'うえ'])
+            self.assertEqual(self.sut.trim_tail(txt + ' ', 'お'),
+                             txt)
+
+        self.assertEqual(self.trimmer.trim_blank.call_count, 2)
+        self.assertEqual(self.sut.cache_info()['size'], 1)
@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import Mock
+from sphinx.errors import ConfigError
+from docutils import nodes
+from sphinx import addnodes
+from sphinxcontrib.trimblank import (
+    Trimmer, compile_trimmers, get_skip_nodes, get_trimmer)
+
+def make_config(**kwargs):
+    values = {
+        'trimblank_enabled': True,
+        'trimblank_keep_alnum_blank': False,
+        'trimblank_keep_blank_before': r'[\s(]',
+        'trimblank_keep_blank_after': r'[\s),.:?]',
+        'trimblank_engine': 'node',
+        'trimblank_cache_size': 0,
+        'trimblank_char_ranges': Trimmer.CJK_INTERVALS,
+        'trimblank_skip_nodes': [],
+        'trimblank_skip_classes': [],
+        'trimblank_trim_source': False,
+    }
+    values.update(kwargs)
+    return Mock(**values)
+
+class TrimmerRegistryTest(unittest.TestCase):
+    def test_same_options_share_trimmer(self):
+        config = make_config()
+
+        self.assertIs(get_trimmer(config, False), get_trimmer(make_config(), False))
+        self.assertIsNot(get_trimmer(config, False), get_trimmer(config, True))
+
+    def test_compile_trimmers(self):
+        config = make_config(trimblank_keep_alnum_blank=['latex'])
+
+        compile_trimmers(Mock(), config)
+
+        self.assertEqual(
+            get_trimmer(config, True).trim_blank('You は me'), 'You は me')
+
+    def test_compile_trimmers_with_invalid_pattern(self):
+        for name in ('trimblank_keep_blank_before',
+                     'trimblank_keep_blank_after'):
+            with self.subTest(name=name):
+                config = make_config(**{name: r'[\s('})
+
+                with self.assertRaisesRegex(ConfigError, name):
+                    compile_trimmers(Mock(), config)
+
+    def test_compile_trimmers_with_variable_width_pattern(self):
+        # Valid by itself, but not in a look-behind.
+        config = make_config(trimblank_keep_blank_after=r'[\s)]+')
+
+        with self.assertRaisesRegex(ConfigError,
+                                    'trimblank_keep_blank_after.*look-behind'):
+            compile_trimmers(Mock(), config)
+
+    def test_compile_trimmers_with_quantifier(self):
+        config = make_config(trimblank_keep_blank_before=r'[\s(]{1}')
+
+        compile_trimmers(Mock(), config)
+
+        self.assertEqual(
+            get_trimmer(config, False).trim_blank('あ (い) う い'),
+            'あ (い) うい')
+
+    def test_compile_trimmers_with_invalid_engine(self):
+        config = make_config(trimblank_engine='regex')
+
+        with self.assertRaisesRegex(ConfigError, 'trimblank_engine'):
+            compile_trimmers(Mock(), config)
+
+    def test_compile_trimmers_with_trim_source_and_skip(self):
+        for name, value in [('trimblank_skip_nodes', ['table']),
+                            ('trimblank_skip_classes', ['raw'])]:
+            with self.subTest(name=name):
+                config = make_config(trimblank_trim_source=True,
+                                     **{name: value})
+
+                with self.assertRaisesRegex(ConfigError,
+                                            'trimblank_trim_source'):
+                    compile_trimmers(Mock(), config)
+
+        compile_trimmers(Mock(), make_config(trimblank_trim_source=True))
+
+    def test_get_trimmer_with_char_ranges(self):
+        config = make_config(
+            trimblank_char_ranges=[(0x3040, 0x30FF), ('가', '힣')])
+
+        trimmer = get_trimmer(config, False)
+
+        self.assertEqual(trimmer.trim_blank('abc 文章 한국어'), 'abc 文章한국어')
+
+    def test_compile_trimmers_with_invalid_char_ranges(self):
+        for char_ranges in ([(0x9FFF, 0x2E80)], [(0x2E80,)], [('あい', 'ん')],
+                            [(0, 0x110000)], [0x2E80]):
+            with self.subTest(char_ranges=char_ranges):
+                config = make_config(trimblank_char_ranges=char_ranges)
+
+                with self.assertRaisesRegex(ConfigError,
+                                            'trimblank_char_ranges'):
+                    compile_trimmers(Mock(), config)
+
+    def test_get_skip_nodes(self):
+        config = make_config(trimblank_skip_nodes=[
+            'table', 'desc_signature', 'sphinx.addnodes.toctree',
+            nodes.comment])
+
+        self.assertEqual(
+            get_skip_nodes(config),
+            (nodes.table, addnodes.desc_signature, addnodes.toctree,
+             nodes.comment))
+
+    def test_compile_trimmers_with_invalid_skip_nodes(self):
+        for name in ('unknown', 'docutils.nodes.fully_normalize_name',
+                     'unknown_module.table'):
+            with self.subTest(name=name):
+                config = make_config(trimblank_skip_nodes=[name])
+
+                with self.assertRaisesRegex(ConfigError, 'trimblank_skip_nodes'):
+                    compile_trimmers(Mock(), config)